@@ -1,134 +1,418 @@
-from flask import Flask, request, jsonify
+from flask import Blueprint, Flask, current_app, request, jsonify
 import os
 import logging
 import tempfile
+import bisect
 import hashlib
+import shutil
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from werkzeug.utils import secure_filename
 from hash_generator import HashGenerator
-from feature_comparison import VideoComparator
+from feature_comparison import (VideoComparator, _hamming_similarity_matrix, _hash_column, _hex_to_int,
+                                frame_digest)
 import cv2
+import numpy as np
 import json
+import orjson
 from datetime import datetime
 
+# PyAV (libav bindings) is optional; fall back to OpenCV decoding without it
+try:
+    import av
+except ImportError:
+    av = None
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = Flask(__name__)
-
-# Initialize both engines
-hash_generator = HashGenerator()
-feature_comparison = VideoComparator()
+api = Blueprint('api', __name__)
 
 # Configuration
 UPLOAD_FOLDER = '/tmp/video-uploads'
 ALLOWED_EXTENSIONS = {'mp4', 'avi', 'mov', 'mkv', 'webm', 'flv'}
 MAX_CONTENT_LENGTH = 100 * 1024 * 1024  # 100MB
 
-app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
-app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH
-
 # Ensure upload directory exists
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
+# TensorFlow-backed engines, loaded once per process by init_engines()
+_engines = {}
+_engines_lock = threading.Lock()
+
+def init_engines():
+    """
+    Load both engines, sharing a single HashGenerator (and so a single TF
+    model). gunicorn calls this from post_worker_init so TF loads after
+    fork; otherwise the first request that needs an engine does
+    """
+    with _engines_lock:
+        if not _engines:
+            generator = HashGenerator()
+            # Publish both at once so lock-free readers never see half of them
+            _engines.update(
+                hash_generator=generator,
+                feature_comparison=VideoComparator(hash_generator=generator,
+                                                   feature_cache=feature_cache)
+            )
+    return _engines
+
+def get_hash_generator():
+    return (_engines or init_engines())['hash_generator']
+
+def get_feature_comparison():
+    return (_engines or init_engines())['feature_comparison']
+
+class FeatureCache:
+    """Thread-safe LRU of generated features keyed by content digest"""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            features = self._entries.get(key)
+            if features is None:
+                return None
+            self._entries.move_to_end(key)
+            return dict(features)
+
+    def put(self, key, features):
+        with self._lock:
+            self._entries[key] = dict(features)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+# Per-frame feature generation (OpenCV, NumPy and TF release the GIL)
+feature_executor = ThreadPoolExecutor(max_workers=os.cpu_count() or 4)
+
+# Each entry carries a 1280-d TF embedding as an ndarray: ~5KB float32 from
+# this module, ~2.5KB float16 from VideoComparator, plus ~1KB of hashes and
+# visual features. The default 1024 entries is ~6MB per worker process
+feature_cache = FeatureCache(maxsize=int(os.environ.get('FEATURE_CACHE_SIZE', 1024)))
+
+def json_response(payload):
+    """
+    JSON response encoded with orjson, which serializes NumPy arrays (frame
+    TF embeddings) natively instead of walking Python float lists
+    """
+    return current_app.response_class(
+        orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY),
+        mimetype='application/json'
+    )
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+HASH_CHUNK_SIZE = 1024 * 1024  # 1MB
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1MB
+
+def save_upload(file, file_path):
+    """Stream an uploaded file to disk in large chunks"""
+    with open(file_path, 'wb') as dst:
+        shutil.copyfileobj(file.stream, dst, length=UPLOAD_CHUNK_SIZE)
+
 def calculate_sha256(file_path):
     """Calculate SHA-256 hash of file"""
-    sha256_hash = hashlib.sha256()
     with open(file_path, "rb") as f:
-        for chunk in iter(lambda: f.read(4096), b""):
-            sha256_hash.update(chunk)
-    return sha256_hash.hexdigest()
+        if hasattr(hashlib, 'file_digest'):
+            # Python 3.11+: read/update loop runs in C with the GIL released
+            return hashlib.file_digest(f, 'sha256').hexdigest()
+
+        sha256_hash = hashlib.sha256()
+        buf = bytearray(HASH_CHUNK_SIZE)
+        view = memoryview(buf)
+        while True:
+            size = f.readinto(buf)
+            if not size:
+                break
+            sha256_hash.update(view[:size])
+        return sha256_hash.hexdigest()
+
+# Sample spacing (in seconds of video) above which the OpenCV sampler seeks
+# to each sample rather than decoding the stream sequentially; longer than
+# the keyframe interval of typical encodes (e.g. x264's default 250 frames)
+SEEK_MIN_STEP_SECONDS = 10
+
+def _sample_frames_av(video_path, max_frames):
+    """
+    Sample up to max_frames frames spread evenly over the video with PyAV.
+    Each sample is the first keyframe in its slot of the timeline, decoded on
+    its own with non-key frames skipped. Slots without a keyframe (long GOPs)
+    decode forward from the preceding keyframe to the slot start instead.
+    Returns (frame_iter, duration, frame_count).
+    """
+    container = av.open(video_path)
+    try:
+        stream = container.streams.video[0]
+        stream.thread_type = 'AUTO'
+
+        fps = float(stream.average_rate or 0)
+        if stream.duration is not None:
+            duration = float(stream.duration * stream.time_base)
+        else:
+            duration = (container.duration or 0) / av.time_base
+        frame_count = stream.frames or int(round(duration * fps))
+    except Exception:
+        container.close()
+        raise
+
+    def to_sample(frame):
+        timestamp = float(frame.time or 0)
+        return int(round(timestamp * fps)), timestamp, frame.to_ndarray(format='bgr24')
+
+    def keyframes_only():
+        # Unknown duration: no timeline to slot, take the first keyframes
+        stream.codec_context.skip_frame = 'NONKEY'
+        for sampled, frame in enumerate(container.decode(stream)):
+            if sampled >= max_frames:
+                break
+            yield to_sample(frame)
+
+    def frame_iter():
+        try:
+            if duration <= 0:
+                yield from keyframes_only()
+                return
+
+            # Keyframe positions from a demux pass (packets are read, not decoded)
+            keyframes = sorted(packet.pts for packet in container.demux(stream)
+                               if packet.is_keyframe and packet.pts is not None)
+            start = stream.start_time or 0
+            slot = duration / max_frames / stream.time_base
+
+            decoder = None
+            full_decode = False
+            position = None  # pts of the last frame decoded in full-decode mode
+            for k in range(max_frames):
+                target = start + int(k * slot)
+                i = bisect.bisect_left(keyframes, target)
+                if i < len(keyframes) and keyframes[i] < start + int((k + 1) * slot):
+                    # A keyframe inside the slot: seek straight to it
+                    want = keyframes[i]
+                    stream.codec_context.skip_frame = 'NONKEY'
+                    container.seek(want, stream=stream)
+                    decoder, full_decode, position = container.decode(stream), False, None
+                else:
+                    want = target
+                    # Keep decoding forward when no keyframe lies between the
+                    # current position and the target (a seek would land on
+                    # the same or an earlier keyframe); otherwise seek back to
+                    # the keyframe preceding the target
+                    previous_keyframe = keyframes[i - 1] if i > 0 else start
+                    if not full_decode or position is None or position >= want or previous_keyframe > position:
+                        stream.codec_context.skip_frame = 'DEFAULT'
+                        container.seek(want, stream=stream)
+                        decoder, full_decode = container.decode(stream), True
+
+                for frame in decoder:
+                    if frame.pts is not None and frame.pts < want:
+                        continue
+                    if full_decode:
+                        position = frame.pts
+                    yield to_sample(frame)
+                    break
+                else:
+                    break  # end of stream
+        finally:
+            container.close()
+
+    return frame_iter(), duration, frame_count
+
+def _sample_frames_cv2(video_path, max_frames):
+    """
+    Sample up to max_frames frames spread evenly over the video with OpenCV.
+    Returns (frame_iter, duration, frame_count).
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise Exception("Could not open video file")
+
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    duration = frame_count / fps if fps > 0 else 0
+
+    def frame_iter():
+        try:
+            step = max(1, frame_count // max_frames)
+
+            if step >= SEEK_MIN_STEP_SECONDS * (fps if fps > 0 else 25):
+                # Samples are further apart than any usual GOP: seek to each
+                # one, so only the frames from its preceding keyframe are
+                # decoded instead of the whole video
+                for i in range(0, frame_count, step)[:max_frames]:
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, i)
+                    ret, frame = cap.read()
+                    if not ret:
+                        break
+                    yield i, (i / fps if fps > 0 else 0), frame
+                return
+
+            # Short strides: walk the stream sequentially. grab() still decodes
+            # every frame (only the colour conversion is left to retrieve()),
+            # but with samples a GOP or less apart a seek would decode about
+            # as many frames again from the previous keyframe
+            for i in range(frame_count):
+                if not cap.grab():
+                    break
+                if i % step != 0:
+                    continue
+                ret, frame = cap.retrieve()
+                if not ret:
+                    break
+                yield i, (i / fps if fps > 0 else 0), frame
+        finally:
+            cap.release()
+
+    return frame_iter(), duration, frame_count
+
+def _generate_frame_features(frame):
+    """
+    Features for one decoded frame, served from the cache when possible.
+    Returns (features, cache_key, tf_input); tf_input is only set when the
+    TF embedding still has to be computed by the caller's batch
+    """
+    # Generate features directly from the decoded frame (no disk round-trip)
+    key = f"frame:{frame_digest(frame)}"
+    features = feature_cache.get(key)
+    if features is not None:
+        return features, key, None
+
+    hash_generator = get_hash_generator()
+    features = hash_generator.generate_all_features_from_array(frame, include_tf_embedding=False)
+    if not features or features.get('error'):
+        return features, key, None
+
+    if not hash_generator.tf_available:
+        feature_cache.put(key, features)
+        return features, key, None
+    return features, key, hash_generator.prepare_tf_input(frame)
 
 def extract_video_frames(video_path, max_frames=10):
     """Extract frames from video for analysis - FIXED VERSION"""
     try:
-        cap = cv2.VideoCapture(video_path)
-        if not cap.isOpened():
-            raise Exception("Could not open video file")
-            
-        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        duration = frame_count / fps if fps > 0 else 0
+        sampler = None
+        if av is not None:
+            try:
+                sampler = _sample_frames_av(video_path, max_frames)
+            except Exception as e:
+                logger.warning(f"PyAV could not open {video_path}, falling back to OpenCV: {e}")
+        if sampler is None:
+            sampler = _sample_frames_cv2(video_path, max_frames)
+        frame_iter, duration, frame_count = sampler
+
+        # Decoding stays on this thread (codec state is sequential); feature
+        # generation for each sampled frame runs on the shared pool meanwhile
+        futures = []
+        for i, timestamp, frame in frame_iter:
+            futures.append((i, timestamp, feature_executor.submit(_generate_frame_features, frame)))
+            if len(futures) >= max_frames:
+                break
         
+        frame_iter.close()
+
         frames = []
-        step = max(1, frame_count // max_frames)
-        
-        for i in range(0, frame_count, step):
-            cap.set(cv2.CAP_PROP_POS_FRAMES, i)
-            ret, frame = cap.read()
-            if not ret:
-                break
-                
-            timestamp = i / fps if fps > 0 else 0
-            
-            # Save frame temporarily for hash generation
-            temp_frame_path = os.path.join(UPLOAD_FOLDER, f"frame_{i}.jpg")
-            cv2.imwrite(temp_frame_path, frame)
-            
-            # Generate features for this frame
+        # (features, cache key) of frames that still need a TF embedding
+        pending = []
+        tf_inputs = []
+        for i, timestamp, future in futures:
             try:
-                frame_features = hash_generator.generate_all_features(temp_frame_path)
+                frame_features, key, tf_input = future.result()
                 
                 # ✅ FIXED: Check if features were generated (no 'success' field needed)
                 if frame_features and not frame_features.get('error'):
+                    if tf_input is not None:
+                        tf_inputs.append(tf_input)
+                        pending.append((frame_features, key))
                     frames.append({
                         'timestamp': timestamp,
                         'frame_number': i,
-                        'features': frame_features
+                        'features': frame_features,
+                        # Parsed once here; hex stays in features for serialization
+                        'phash_int': _hex_to_int(frame_features.get('phash'))
                     })
                     
             except Exception as e:
                 logger.warning(f"Failed to generate features for frame {i}: {e}")
-            finally:
-                # Clean up temp frame
-                if os.path.exists(temp_frame_path):
-                    os.remove(temp_frame_path)
-            
-            if len(frames) >= max_frames:
-                break
-        
-        cap.release()
+
+        if tf_inputs:
+            try:
+                embeddings = get_hash_generator().embed_batch(tf_inputs)
+                for (frame_features, key), embedding in zip(pending, embeddings):
+                    frame_features['tf_embedding'] = embedding
+                    feature_cache.put(key, frame_features)
+            except Exception as e:
+                logger.warning(f"Batched TensorFlow embedding failed: {e}")
+
         return frames, duration, frame_count
         
     except Exception as e:
         raise Exception(f"Frame extraction failed: {e}")
 
-def calculate_visual_similarity(original_frames, suspected_frames):
-    """Calculate visual similarity between frame sets"""
+def _has_features(frame):
+    features = frame.get('features', {})
+    return bool(features) and not features.get('error')
+
+def _parse_phashes(frames):
+    """
+    Collect each usable frame pHash as an int. Returns (indices, values)
+    where indices are positions in frames. Uses the 'phash_int' parsed by
+    extract_video_frames when present.
+    """
+    indices, values = [], []
+    for idx, frame in enumerate(frames):
+        if not _has_features(frame):
+            continue
+        if 'phash_int' in frame:
+            value = frame['phash_int']
+        else:
+            value = _hex_to_int(frame['features'].get('phash'))
+        if value is None:
+            continue
+        indices.append(idx)
+        values.append(value)
+    return indices, values
+
+def phash_similarity_matrix(original_frames, suspected_frames):
+    """
+    Pairwise pHash similarity between two frame sets in one vectorized pass.
+    Returns (sim, orig_idx, susp_idx): sim[r, c] compares
+    original_frames[orig_idx[r]] with suspected_frames[susp_idx[c]].
+    """
+    orig_idx, orig_values = _parse_phashes(original_frames)
+    susp_idx, susp_values = _parse_phashes(suspected_frames)
+
+    # Every parsed hash is present, so the validity mask is all True
+    sim, _ = _hamming_similarity_matrix(*_hash_column(orig_values), *_hash_column(susp_values))
+    return sim, orig_idx, susp_idx
+
+def calculate_visual_similarity(original_frames, suspected_frames, phash_matrix=None):
+    """
+    Calculate visual similarity between frame sets. phash_matrix can pass in
+    an already computed phash_similarity_matrix() result
+    """
     try:
         if not original_frames or not suspected_frames:
             return 0.0
-            
-        similarities = []
-        for orig_frame in original_frames:
-            orig_features = orig_frame.get('features', {})
-            if not orig_features or orig_features.get('error'):
-                continue
-                
-            best_match = 0.0
-            for susp_frame in suspected_frames:
-                susp_features = susp_frame.get('features', {})
-                if not susp_features or susp_features.get('error'):
-                    continue
-                    
-                # Compare perceptual hashes
-                orig_phash = orig_features.get('phash', '')
-                susp_phash = susp_features.get('phash', '')
-                
-                if orig_phash and susp_phash:
-                    try:
-                        # Calculate Hamming distance for pHash
-                        similarity = 1.0 - (bin(int(orig_phash, 16) ^ int(susp_phash, 16)).count('1') / 64.0)
-                        best_match = max(best_match, similarity)
-                    except (ValueError, TypeError):
-                        continue
-                    
-            similarities.append(best_match)
-            
-        return sum(similarities) / len(similarities) if similarities else 0.0
+
+        # Every original frame with features counts; unmatched ones score 0
+        frames_compared = sum(1 for frame in original_frames if _has_features(frame))
+        if frames_compared == 0:
+            return 0.0
+
+        if phash_matrix is None:
+            phash_matrix = phash_similarity_matrix(original_frames, suspected_frames)
+        sim = phash_matrix[0]
+        if sim.size == 0:
+            return 0.0
+
+        best_matches = np.maximum(sim.max(axis=1), 0.0)
+        return float(best_matches.sum() / frames_compared)
         
     except Exception as e:
         logger.warning(f"Visual similarity calculation failed: {e}")
@@ -154,52 +438,52 @@ def calculate_temporal_alignment(original_frames, suspected_frames):
         logger.warning(f"Temporal alignment calculation failed: {e}")
         return 0.0
 
-def find_matching_frames(original_frames, suspected_frames):
-    """Find matching frames between videos"""
+def find_matching_frames(original_frames, suspected_frames, phash_matrix=None):
+    """
+    Find matching frames between videos. phash_matrix can pass in an already
+    computed phash_similarity_matrix() result
+    """
     try:
         matches = []
         threshold = 0.8
-        
-        for i, orig_frame in enumerate(original_frames):
-            orig_features = orig_frame.get('features', {})
-            if not orig_features or orig_features.get('error'):
-                continue
-                
-            for j, susp_frame in enumerate(suspected_frames):
-                susp_features = susp_frame.get('features', {})
-                if not susp_features or susp_features.get('error'):
-                    continue
-                    
-                # Compare features
-                orig_phash = orig_features.get('phash', '')
-                susp_phash = susp_features.get('phash', '')
-                
-                if orig_phash and susp_phash:
-                    try:
-                        similarity = 1.0 - (bin(int(orig_phash, 16) ^ int(susp_phash, 16)).count('1') / 64.0)
-                        
-                        if similarity >= threshold:
-                            matches.append({
-                                "original_frame": i,
-                                "suspected_frame": j,
-                                "similarity": similarity,
-                                "original_timestamp": orig_frame['timestamp'],
-                                "suspected_timestamp": susp_frame['timestamp']
-                            })
-                    except (ValueError, TypeError):
-                        continue
+
+        if phash_matrix is None:
+            phash_matrix = phash_similarity_matrix(original_frames, suspected_frames)
+        sim, orig_idx, susp_idx = phash_matrix
+
+        # Top 10 matches by score: argpartition selects them without a full
+        # sort, then only those k are ordered (ties keep row-major order)
+        flat = sim.ravel()
+        candidates = np.flatnonzero(flat >= threshold)
+        k = min(10, candidates.size)
+        if k == 0:
+            return matches
+        if k < candidates.size:
+            candidates = np.sort(candidates[np.argpartition(-flat[candidates], k - 1)[:k]])
+        top = candidates[np.argsort(-flat[candidates], kind='stable')]
+
+        for r, c in zip(*np.unravel_index(top, sim.shape)):
+            i, j = orig_idx[r], susp_idx[c]
+            matches.append({
+                "original_frame": i,
+                "suspected_frame": j,
+                "similarity": float(sim[r, c]),
+                "original_timestamp": original_frames[i]['timestamp'],
+                "suspected_timestamp": suspected_frames[j]['timestamp']
+            })
                         
-        return matches[:10]  # Return top 10 matches
+        return matches
         
     except Exception as e:
         logger.warning(f"Frame matching failed: {e}")
         return []
 
-@app.route('/health', methods=['GET'])
+@api.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint for Docker"""
     try:
-        comparison_health = feature_comparison.health_check()
+        hash_generator = get_hash_generator()
+        comparison_health = get_feature_comparison().health_check()
         return jsonify({
             "status": "healthy",
             "tensorflow_available": hash_generator.tf_available,
@@ -221,7 +505,7 @@ def health_check():
 
 # 🆕 COPYRIGHT SHIELD ENDPOINTS
 
-@app.route('/generate-certificate', methods=['POST'])
+@api.route('/generate-certificate', methods=['POST'])
 def generate_certificate():
     """Generate digital certificate for uploaded video - COMPLETE FIXED VERSION"""
     try:
@@ -241,18 +525,24 @@ def generate_certificate():
 
         # Save uploaded file
         filename = secure_filename(file.filename)
-        timestamp = int(datetime.now().timestamp())
+        now = datetime.now()
+        now_iso = now.isoformat()
+        timestamp = int(now.timestamp())
         safe_filename = f"{timestamp}_{filename}"
-        file_path = os.path.join(UPLOAD_FOLDER, safe_filename)
-        file.save(file_path)
+        # Per-request directory: no name clashes between concurrent uploads,
+        # and it is removed with everything in it on every exit path
+        with tempfile.TemporaryDirectory(dir=UPLOAD_FOLDER) as request_dir:
+            file_path = os.path.join(request_dir, safe_filename)
+            save_upload(file, file_path)
 
-        try:
-            # Calculate file hash
-            file_hash = calculate_sha256(file_path)
-            file_size = os.path.getsize(file_path)
-            
-            # Extract frames and generate content hashes
-            frames, duration, total_frames = extract_video_frames(file_path, max_frames=10)
+            # Hash the file while frames are extracted; both release the GIL
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                hash_future = executor.submit(calculate_sha256, file_path)
+                file_size = os.path.getsize(file_path)
+                
+                # Extract frames and generate content hashes
+                frames, duration, total_frames = extract_video_frames(file_path, max_frames=10)
+                file_hash = hash_future.result()
             
             # ✅ FIXED: Proper content hash extraction with all features
             content_hashes = []
@@ -263,21 +553,22 @@ def generate_certificate():
                         "frame_index": frame['frame_number'],
                         "timestamp": frame['timestamp'],
                         "phash": features.get('phash', ''),
-                        "dct_hash": features.get('dct_hash', ''),
+                        # None for video frames: the frame pHash already covers the DCT signal
+                        "dct_hash": features.get('dct_hash'),
                         "advanced_features": features.get('advanced_features', {}),
                     }
                     
-                    # Include TensorFlow embedding if available
+                    # Include TensorFlow embedding if available, quantized to int8
                     tf_embedding = features.get('tf_embedding')
-                    if tf_embedding:
-                        content_hash["tf_embedding"] = tf_embedding
+                    if tf_embedding is not None and len(tf_embedding) > 0:
+                        content_hash["tf_embedding_int8"] = HashGenerator.quantize_embedding(tf_embedding)
                         
                     content_hashes.append(content_hash)
             
             # Generate certificate data
             certificate_data = {
                 "certificate_id": f"CS-{timestamp}-{file_hash[:16]}",
-                "timestamp": datetime.now().isoformat(),
+                "timestamp": now_iso,
                 "file_info": {
                     "original_filename": filename,
                     "file_size": file_size,
@@ -291,22 +582,17 @@ def generate_certificate():
                 },
                 "technical_metadata": {
                     "processing_engine": "Copyright Shield AI v1.0",
-                    "generation_timestamp": datetime.now().isoformat(),
-                    "algorithms_used": ["SHA-256", "Perceptual Hash", "DCT Hash", "TensorFlow Features"],
-                    "tensorflow_available": hash_generator.tf_available
+                    "generation_timestamp": now_iso,
+                    "algorithms_used": ["SHA-256", "Perceptual Hash", "TensorFlow Features"],
+                    "tensorflow_available": get_hash_generator().tf_available
                 }
             }
             
-            return jsonify({
+            return json_response({
                 "status": "success",
                 "certificate": certificate_data
             }), 200
 
-        finally:
-            # Clean up uploaded file
-            if os.path.exists(file_path):
-                os.remove(file_path)
-                
     except Exception as e:
         logger.error(f"Certificate generation failed: {e}")
         return jsonify({
@@ -314,7 +600,7 @@ def generate_certificate():
             "error": str(e)
         }), 500
 
-@app.route('/analyze-similarity', methods=['POST'])
+@api.route('/analyze-similarity', methods=['POST'])
 def analyze_similarity():
     """Analyze similarity between two uploaded videos - COMPLETE VERSION"""
     try:
@@ -338,42 +624,53 @@ def analyze_similarity():
             }), 400
 
         # Save uploaded files
-        timestamp = int(datetime.now().timestamp())
+        now = datetime.now()
+        now_iso = now.isoformat()
+        timestamp = int(now.timestamp())
         
         original_filename = secure_filename(original_file.filename)
         suspected_filename = secure_filename(suspected_file.filename)
         
-        original_path = os.path.join(UPLOAD_FOLDER, f"{timestamp}_original_{original_filename}")
-        suspected_path = os.path.join(UPLOAD_FOLDER, f"{timestamp}_suspected_{suspected_filename}")
-        
-        original_file.save(original_path)
-        suspected_file.save(suspected_path)
+        # Per-request directory, removed with both uploads on every exit path
+        with tempfile.TemporaryDirectory(dir=UPLOAD_FOLDER) as request_dir:
+            original_path = os.path.join(request_dir, f"{timestamp}_original_{original_filename}")
+            suspected_path = os.path.join(request_dir, f"{timestamp}_suspected_{suspected_filename}")
 
-        try:
-            # Calculate file hashes
-            original_hash = calculate_sha256(original_path)
-            suspected_hash = calculate_sha256(suspected_path)
-            original_size = os.path.getsize(original_path)
-            suspected_size = os.path.getsize(suspected_path)
-            
-            # Extract frames from both videos
-            original_frames, original_duration, original_frame_count = extract_video_frames(original_path, max_frames=20)
-            suspected_frames, suspected_duration, suspected_frame_count = extract_video_frames(suspected_path, max_frames=20)
+            save_upload(original_file, original_path)
+            save_upload(suspected_file, suspected_path)
+
+            # Hash and extract frames from both videos concurrently
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                original_hash_future = executor.submit(calculate_sha256, original_path)
+                suspected_hash_future = executor.submit(calculate_sha256, suspected_path)
+                original_frames_future = executor.submit(extract_video_frames, original_path, max_frames=20)
+                suspected_frames_future = executor.submit(extract_video_frames, suspected_path, max_frames=20)
+
+                original_size = os.path.getsize(original_path)
+                suspected_size = os.path.getsize(suspected_path)
+
+                original_frames, original_duration, original_frame_count = original_frames_future.result()
+                suspected_frames, suspected_duration, suspected_frame_count = suspected_frames_future.result()
+                original_hash = original_hash_future.result()
+                suspected_hash = suspected_hash_future.result()
             
+            # Pairwise pHash similarity, shared by the visual score and frame matching
+            phash_matrix = phash_similarity_matrix(original_frames, suspected_frames)
+
             # Calculate similarity metrics
-            visual_similarity = calculate_visual_similarity(original_frames, suspected_frames)
+            visual_similarity = calculate_visual_similarity(original_frames, suspected_frames, phash_matrix)
             temporal_alignment = calculate_temporal_alignment(original_frames, suspected_frames)
             overall_confidence = (visual_similarity + temporal_alignment) / 2
             
             # Find matching frames
-            matched_frames = find_matching_frames(original_frames, suspected_frames)
+            matched_frames = find_matching_frames(original_frames, suspected_frames, phash_matrix)
             
             # Generate analysis ID
             analysis_id = f"SA-{timestamp}-{original_hash[:8]}-{suspected_hash[:8]}"
             
             analysis_data = {
                 "analysis_id": analysis_id,
-                "timestamp": datetime.now().isoformat(),
+                "timestamp": now_iso,
                 "files": {
                     "original": {
                         "filename": original_filename,
@@ -407,22 +704,16 @@ def analyze_similarity():
                 },
                 "technical_metadata": {
                     "processing_engine": "Copyright Shield AI v1.0",
-                    "analysis_timestamp": datetime.now().isoformat(),
-                    "algorithms_used": ["Perceptual Hash", "DCT Hash", "TensorFlow Features", "Frame Comparison"]
+                    "analysis_timestamp": now_iso,
+                    "algorithms_used": ["Perceptual Hash", "TensorFlow Features", "Frame Comparison"]
                 }
             }
             
-            return jsonify({
+            return json_response({
                 "status": "success",
                 "analysis": analysis_data
             }), 200
 
-        finally:
-            # Clean up uploaded files
-            for file_path in [original_path, suspected_path]:
-                if os.path.exists(file_path):
-                    os.remove(file_path)
-                    
     except Exception as e:
         logger.error(f"Similarity analysis failed: {e}")
         return jsonify({
@@ -432,7 +723,7 @@ def analyze_similarity():
 
 # LEGACY ENDPOINTS (Keep for backward compatibility)
 
-@app.route('/generate-hash', methods=['POST'])
+@api.route('/generate-hash', methods=['POST'])
 def generate_hash():
     """Generate advanced hash for single image"""
     try:
@@ -445,13 +736,30 @@ def generate_hash():
         if not os.path.exists(image_path):
             return jsonify({"error": f"Image file not found: {image_path}"}), 404
             
-        result = hash_generator.generate_all_features(image_path)
-        return jsonify(result), 200
+        key = f"file:{calculate_sha256(image_path)}"
+        result = feature_cache.get(key)
+        if result is None:
+            result = get_hash_generator().generate_all_features(image_path)
+            if not result.get('error'):
+                feature_cache.put(key, result)
+        result['image_path'] = image_path
+        return json_response(result), 200
         
     except Exception as e:
         logger.error(f"Hash generation failed: {e}")
         return jsonify({"error": str(e), "success": False}), 500
 
+def create_app():
+    """Application factory; gunicorn serves the module-level app:app"""
+    app = Flask(__name__)
+    app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+    app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH
+    app.register_blueprint(api)
+    return app
+
+app = create_app()
+
 if __name__ == '__main__':
+    # Local development only; containers serve through gunicorn (gunicorn.conf.py)
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port, debug=True)
+    app.run(host='0.0.0.0', port=port, threaded=True)
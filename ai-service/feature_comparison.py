@@ -2,35 +2,298 @@
 
 import sys
 import json
+import hashlib
 import numpy as np
 import cv2
 import os
-import tempfile
 import logging
 import time
-from typing import List, Dict, Optional
-from dataclasses import dataclass
-from scipy.spatial.distance import cosine
+import atexit
+import multiprocessing
+import threading
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from typing import Callable, List, Dict, Optional, Tuple
+from dataclasses import asdict, dataclass, field
+
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+
+# BLAKE3 is optional; frame digests fall back to hashlib's BLAKE2b
+try:
+    import blake3
+except ImportError:
+    blake3 = None
+
+# decord is optional; frame sampling falls back to cv2.VideoCapture
+try:
+    import decord
+except ImportError:
+    decord = None
 
 # Import existing hash generator
 from hash_generator import HashGenerator
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Logging is configured by the host application (see __main__ below)
 logger = logging.getLogger(__name__)
 
-@dataclass
+@lru_cache(maxsize=65536)
+def _hex_to_int(hex_hash: Optional[str]) -> Optional[int]:
+    """Parse a hex hash string, returning None when missing or malformed"""
+    if not hex_hash:
+        return None
+    try:
+        return int(hex_hash, 16)
+    except (ValueError, TypeError):
+        return None
+
+NUMERICAL_FEATURES = ['brightness', 'contrast', 'complexity', 'edge_density']
+
+# Frame pairs whose pHashes differ in more than 24 of 64 bits are not
+# candidates: they score 0.0 without computing the remaining components
+PHASH_CANDIDATE_SIMILARITY = 1 - 24 / 64.0
+
+# Set bits per byte value, for table-lookup popcount over packed hashes
+_POPCOUNT_LUT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+def _hamming_similarity_matrix(words1: np.ndarray, ok1: np.ndarray,
+                               words2: np.ndarray, ok2: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Pairwise 1 - hamming/64 for two hash columns (see FrameFeaturesBatch).
+    Returns (similarity, valid) where valid marks pairs with both hashes present
+    """
+    valid = ok1[:, None] & ok2[None, :]
+
+    if words1.dtype == np.uint64 and words2.dtype == np.uint64:
+        # 64-bit hashes: XOR the whole matrix at once and count bits over
+        # its byte view
+        xor = words1[:, None] ^ words2[None, :]
+        distances = _POPCOUNT_LUT[xor.view(np.uint8)].reshape(*xor.shape, 8).sum(axis=-1, dtype=np.int64)
+        return 1.0 - distances / 64.0, valid
+
+    # Wider hashes are kept as Python ints: byte-pack them to a common width
+    values1, values2 = [int(v) for v in words1], [int(v) for v in words2]
+    nbytes = max([(v.bit_length() + 7) // 8 for v in values1 + values2] + [1])
+
+    def pack(values):
+        packed = b''.join(v.to_bytes(nbytes, 'big') for v in values)
+        return np.frombuffer(packed, dtype=np.uint8).reshape(len(values), nbytes)
+
+    xor = pack(values1)[:, None, :] ^ pack(values2)[None, :, :]
+    distances = _POPCOUNT_LUT[xor].sum(axis=-1, dtype=np.int64)
+    return 1.0 - distances / 64.0, valid
+
+def _advanced_vector(advanced_features: Dict) -> np.ndarray:
+    """NUMERICAL_FEATURES values as a float array, 0.0 when missing"""
+    return np.array([advanced_features.get(name, 0.0) for name in NUMERICAL_FEATURES],
+                    dtype=np.float64)
+
+if njit is not None:
+    @njit(cache=True)
+    def _popcount64(x):
+        # SWAR popcount; LLVM folds this pattern into a single ctpop/POPCNT
+        x = x - ((x >> np.uint64(1)) & np.uint64(0x5555555555555555))
+        x = (x & np.uint64(0x3333333333333333)) + ((x >> np.uint64(2)) & np.uint64(0x3333333333333333))
+        x = (x + (x >> np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+        return (x * np.uint64(0x0101010101010101)) >> np.uint64(56)
+
+    @njit(cache=True, parallel=True, fastmath=True)
+    def _score_matrix_kernel(phash1, phash_ok1, phash2, phash_ok2,
+                             dct1, dct_ok1, dct2, dct_ok2,
+                             emb1, emb_scale1, emb_ok1, emb2, emb_scale2, emb_ok2,
+                             adv1, colors1, adv_ok1, adv2, colors2, adv_ok2,
+                             phash_cutoff):
+        """
+        Whole calculate_frame_similarity score for every pair in one pass,
+        over per-component arrays plus presence masks
+        """
+        n, m = phash1.size, phash2.size
+        out = np.zeros((n, m), np.float64)
+        for i in prange(n):
+            for j in range(m):
+                total = 0.0
+                count = 0
+
+                if phash_ok1[i] and phash_ok2[j]:
+                    similarity = 1.0 - _popcount64(phash1[i] ^ phash2[j]) / 64.0
+                    if similarity < phash_cutoff:
+                        continue
+                    total += similarity
+                    count += 1
+
+                if dct_ok1[i] and dct_ok2[j]:
+                    total += 1.0 - _popcount64(dct1[i] ^ dct2[j]) / 64.0
+                    count += 1
+
+                if emb_ok1[i] and emb_ok2[j]:
+                    # int8 dot product with integer accumulation, then rescale
+                    dot = 0
+                    for k in range(emb1.shape[1]):
+                        dot += np.int32(emb1[i, k]) * np.int32(emb2[j, k])
+                    total += dot * emb_scale1[i] * emb_scale2[j]
+                    count += 1
+
+                if adv_ok1[i] and adv_ok2[j]:
+                    adv_total = 0.0
+                    adv_count = 0
+                    for k in range(adv1.shape[1]):
+                        v1 = adv1[i, k]
+                        v2 = adv2[j, k]
+                        if v1 > 0 and v2 > 0:
+                            adv_total += 1.0 - abs(v1 - v2) / max(v1, v2)
+                            adv_count += 1
+                    if colors1[i] and colors2[j]:
+                        adv_total += 0.5  # dominant colors placeholder
+                        adv_count += 1
+                    if adv_count > 0:
+                        total += adv_total / adv_count
+                    count += 1
+
+                if count > 0:
+                    out[i, j] = total / count
+        return out
+else:
+    _score_matrix_kernel = None
+
+def _unit_embedding(embedding) -> Optional[np.ndarray]:
+    """
+    L2-normalize an embedding once so cosine similarity is a plain dot
+    product, stored as float16 (cosine is robust to it, half the memory)
+    """
+    if embedding is None or len(embedding) == 0:
+        return None
+    vector = np.asarray(embedding, dtype=np.float32).ravel()
+    norm = np.linalg.norm(vector)
+    if norm == 0:
+        return None
+    return (vector / norm).astype(np.float16)
+
+def _quantize_unit(vector: np.ndarray) -> Tuple[np.ndarray, float]:
+    """
+    Symmetric int8 quantization of a unit embedding with one scale per vector
+    (same scheme as HashGenerator.quantize_embedding): vector ~= q * scale
+    """
+    vector = np.asarray(vector, dtype=np.float32)
+    max_abs = float(np.abs(vector).max()) if vector.size else 0.0
+    scale = max_abs / 127.0 if max_abs > 0 else 1.0
+    return np.clip(np.round(vector / scale), -127, 127).astype(np.int8), scale
+
+def _has_embedding(features) -> bool:
+    return features.tf_embedding is not None and len(features.tf_embedding) > 0
+
+@dataclass(slots=True)
 class FrameFeatures:
     timestamp: float
     phash: str
     dct_hash: str
-    tf_embedding: Optional[List[float]]
+    # Given as the L2-normalized float16 from _unit_embedding; kept as int8
+    # with tf_scale (see _quantize_unit) for matching
+    tf_embedding: Optional[np.ndarray]
     advanced_features: Dict
     frame_path: Optional[str] = None
     width: int = 0
     height: int = 0
-
-@dataclass
+    # Hashes parsed once for Hamming comparisons (None when missing/invalid)
+    phash_int: Optional[int] = field(default=None, init=False, repr=False)
+    dct_int: Optional[int] = field(default=None, init=False, repr=False)
+    # NUMERICAL_FEATURES pulled out of advanced_features once per frame
+    advanced_vector: Optional[np.ndarray] = field(default=None, init=False, repr=False)
+    tf_scale: float = field(default=1.0, init=False, repr=False)
+
+    def __post_init__(self):
+        self.phash_int = _hex_to_int(self.phash)
+        self.dct_int = _hex_to_int(self.dct_hash)
+        self.advanced_vector = _advanced_vector(self.advanced_features or {})
+        if self.tf_embedding is not None:
+            # Lists (e.g. embeddings read back from JSON) have no dtype; only
+            # an int8 ndarray is already quantized
+            embedding = self.tf_embedding
+            if not (isinstance(embedding, np.ndarray) and embedding.dtype == np.int8):
+                self.tf_embedding, self.tf_scale = _quantize_unit(np.asarray(embedding, dtype=np.float32))
+
+def _hash_column(values: List[Optional[int]]) -> Tuple[np.ndarray, np.ndarray]:
+    """(words, present) for one hash per frame; uint64 unless a hash is wider"""
+    present = np.array([v is not None for v in values], dtype=np.bool_)
+    if any(v is not None and v.bit_length() > 64 for v in values):
+        # e.g. 256-bit pHashes from image paths
+        return np.array([v or 0 for v in values], dtype=object), present
+    return np.fromiter((v or 0 for v in values), dtype=np.uint64, count=len(values)), present
+
+@dataclass(slots=True)
+class FrameFeaturesBatch:
+    """
+    Column-wise (structure of arrays) view of a video's FrameFeatures, built
+    once so the similarity matrix reads contiguous arrays instead of walking
+    a list of objects per component
+    """
+    phash: np.ndarray
+    phash_ok: np.ndarray
+    dct: np.ndarray
+    dct_ok: np.ndarray
+    embeddings: np.ndarray        # (N, D) int8, zero rows where missing
+    embedding_scales: np.ndarray
+    embedding_ok: np.ndarray
+    advanced: np.ndarray          # (N, len(NUMERICAL_FEATURES))
+    colors: np.ndarray
+    advanced_ok: np.ndarray
+    timestamps: np.ndarray
+
+    @classmethod
+    def from_features(cls, features: List[FrameFeatures]) -> 'FrameFeaturesBatch':
+        n = len(features)
+        phash, phash_ok = _hash_column([f.phash_int for f in features])
+        dct, dct_ok = _hash_column([f.dct_int for f in features])
+
+        embedding_ok = np.array([_has_embedding(f) for f in features], dtype=np.bool_)
+        dims = max([len(f.tf_embedding) for f in features if _has_embedding(f)] + [1])
+        embeddings = np.zeros((n, dims), dtype=np.int8)
+        embedding_scales = np.zeros(n, dtype=np.float64)
+        for i in np.flatnonzero(embedding_ok):
+            embeddings[i, :len(features[i].tf_embedding)] = features[i].tf_embedding
+            embedding_scales[i] = features[i].tf_scale
+
+        if n:
+            advanced = np.stack([f.advanced_vector for f in features])
+        else:
+            advanced = np.zeros((0, len(NUMERICAL_FEATURES)), dtype=np.float64)
+
+        return cls(phash=phash, phash_ok=phash_ok, dct=dct, dct_ok=dct_ok,
+                   embeddings=embeddings, embedding_scales=embedding_scales,
+                   embedding_ok=embedding_ok, advanced=advanced,
+                   colors=np.array(['dominant_colors' in f.advanced_features for f in features],
+                                   dtype=np.bool_),
+                   advanced_ok=np.array([bool(f.advanced_features) for f in features],
+                                        dtype=np.bool_),
+                   timestamps=np.array([f.timestamp for f in features], dtype=np.float64))
+
+    def __len__(self) -> int:
+        return self.phash_ok.size
+
+    @property
+    def hashes_fit_u64(self) -> bool:
+        return self.phash.dtype == np.uint64 and self.dct.dtype == np.uint64
+
+def _match_embedding_dims(batch1: FrameFeaturesBatch,
+                          batch2: FrameFeaturesBatch) -> Tuple[np.ndarray, np.ndarray]:
+    """Both embedding columns zero-padded to a common width"""
+    emb1, emb2 = batch1.embeddings, batch2.embeddings
+    dims = max(emb1.shape[1], emb2.shape[1])
+    if emb1.shape[1] < dims:
+        emb1 = np.pad(emb1, ((0, 0), (0, dims - emb1.shape[1])))
+    if emb2.shape[1] < dims:
+        emb2 = np.pad(emb2, ((0, 0), (0, dims - emb2.shape[1])))
+    return emb1, emb2
+
+@dataclass(slots=True)
+class VideoMeta:
+    fps: float
+    total_frames: int
+    duration: float
+
+@dataclass(slots=True)
 class SimilarityResult:
     visual_similarity: float
     temporal_alignment: float
@@ -40,16 +303,142 @@ class SimilarityResult:
     frame_count_suspected: int
     analysis_metadata: Dict
 
+    def to_dict(self) -> Dict:
+        """JSON-ready dict; scores are rounded to 4 decimals only here"""
+        result = asdict(self)
+        for key in ('visual_similarity', 'temporal_alignment', 'overall_confidence'):
+            result[key] = round(result[key], 4)
+        return result
+
+# HashGenerator owned by each feature-extraction worker process
+_worker_hash_generator: Optional[HashGenerator] = None
+
+def _init_extraction_worker():
+    """
+    One HashGenerator per worker process, without the TF model: workers only
+    compute hashes and advanced features, embeddings are batched in the parent
+    """
+    global _worker_hash_generator
+    _worker_hash_generator = HashGenerator(load_tf_model=False)
+
+# Process-wide generator for comparators created without one, so the TF
+# model is loaded once per process rather than once per VideoComparator
+_shared_hash_generator: Optional[HashGenerator] = None
+_shared_hash_generator_lock = threading.Lock()
+
+def _get_shared_hash_generator() -> HashGenerator:
+    global _shared_hash_generator
+    with _shared_hash_generator_lock:
+        if _shared_hash_generator is None:
+            _shared_hash_generator = HashGenerator()
+        return _shared_hash_generator
+
+def _feature_tuple(frame_features: Dict) -> Tuple:
+    """
+    Plain picklable (phash, dct_hash, tf_embedding, advanced_features) from a
+    generate_all_features dict. tf_embedding is unit-normalized float16 (see
+    _unit_embedding), which is also far smaller to send back than a list
+    """
+    return (
+        frame_features.get('phash', ''),
+        frame_features.get('dct_hash', ''),
+        _unit_embedding(frame_features.get('tf_embedding')),
+        frame_features.get('advanced_features', {})
+    )
+
+def _extract_one(frame: np.ndarray) -> Tuple:
+    """
+    Generate features for one decoded BGR frame inside a worker process.
+    TF embeddings are left to the parent, which batches them for all frames
+    """
+    frame_features = _worker_hash_generator.generate_all_features_from_array(
+        frame, include_tf_embedding=False)
+    return _feature_tuple(frame_features)
+
+def _extract_shared_frame(name: str, shape: Tuple, dtype: str) -> Tuple:
+    """_extract_one for a frame the parent placed in a SharedMemory block"""
+    shm = shared_memory.SharedMemory(name=name)
+    frame = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    try:
+        return _extract_one(frame)
+    finally:
+        # close() refuses while views of the buffer exist
+        del frame
+        try:
+            shm.close()
+        except BufferError:
+            # A propagating exception's traceback still holds the view;
+            # the mapping is released along with it
+            pass
+
+def frame_digest(frame: np.ndarray) -> str:
+    """
+    Cheap non-cryptographic content digest of a decoded frame (shape plus
+    pixel bytes). Shared with app.py, whose feature cache this module also
+    uses: both key frames as f"frame:{frame_digest(frame)}"
+    """
+    if blake3 is not None:
+        # SIMD tree hash, several times faster than BLAKE2b on multi-MB frames
+        digest = blake3.blake3(str(frame.shape).encode())
+        digest.update(np.ascontiguousarray(frame))
+        return digest.hexdigest(length=16)
+    digest = hashlib.blake2b(str(frame.shape).encode(), digest_size=16)
+    digest.update(np.ascontiguousarray(frame))
+    return digest.hexdigest()
+
 class VideoComparator:
     """
     Stripped-down video comparison engine for Copyright Shield
     Removes YouTube dependencies, focuses on user-uploaded file analysis
     """
 
-    def __init__(self):
-        self.hash_generator = HashGenerator()
+    def __init__(self, hash_generator: Optional[HashGenerator] = None,
+                 max_workers: Optional[int] = None, feature_cache=None,
+                 decode_threads: int = 0):
+        # Reuse the caller's generator when given so TF is only loaded once
+        self.hash_generator = hash_generator or _get_shared_hash_generator()
+        # Frame feature extraction fans out to this many processes (1 = inline)
+        self.max_workers = max_workers or os.cpu_count() or 1
+        # Optional get/put store (e.g. app.FeatureCache) of per-frame results
+        # keyed by frame content, so re-analysed videos skip extraction
+        self.feature_cache = feature_cache
+        # decord decoder threads (0 = auto); 1 tends to be faster on UHD input
+        self.decode_threads = decode_threads
+        self._process_pool = None
+        # Both videos of an analysis are extracted on separate threads
+        self._process_pool_lock = threading.Lock()
         logger.info("VideoComparator initialized for Copyright Shield")
 
+    def _get_process_pool(self) -> ProcessPoolExecutor:
+        """
+        Worker pool for frame features, created on first use. Workers are
+        spawned rather than forked because TensorFlow is not fork-safe, and
+        each loads its own hash-only HashGenerator once in the initializer
+        """
+        with self._process_pool_lock:
+            if self._process_pool is None:
+                self._process_pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_extraction_worker
+                )
+                # Don't leave workers behind if close() is never called
+                atexit.register(self._process_pool.shutdown, wait=False, cancel_futures=True)
+            return self._process_pool
+
+    def close(self):
+        """Shut down the frame extraction workers, if any were started"""
+        with self._process_pool_lock:
+            pool, self._process_pool = self._process_pool, None
+        if pool is not None:
+            atexit.unregister(pool.shutdown)
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def __del__(self):
+        # Attributes may be missing if __init__ failed part way
+        if getattr(self, '_process_pool', None) is not None:
+            self.close()
+
     def health_check(self) -> Dict:
         """Health check for the comparator"""
         try:
@@ -65,13 +454,27 @@ class VideoComparator:
                 "error": str(e)
             }
 
-    def extract_frames_from_video(self, video_path: str, max_frames: int = 10) -> List[str]:
+    def extract_frames_from_video(self, video_path: str, max_frames: int = 10,
+                                  on_frame: Optional[Callable[[np.ndarray], None]] = None
+                                  ) -> Tuple[List[np.ndarray], VideoMeta]:
         """
-        Extract frames from video file and save as temporary images
-        Returns list of frame file paths
+        Extract frames from video file, kept in memory as BGR arrays
+        Returns decoded frames and the container metadata read on the same open
+        on_frame, if given, is called with each frame as soon as it is decoded
         """
-        frame_paths = []
-        temp_dir = tempfile.mkdtemp()
+        if decord is not None:
+            try:
+                frames, meta = self._read_frames_decord(video_path, max_frames)
+            except Exception as e:
+                logger.warning("decord could not read %s, using OpenCV: %s", video_path, e)
+            else:
+                if on_frame is not None:
+                    for frame in frames:
+                        on_frame(frame)
+                logger.info("Extracted %d frames from %s", len(frames), video_path)
+                return frames, meta
+
+        frames = []
 
         try:
             cap = cv2.VideoCapture(video_path)
@@ -82,82 +485,161 @@ class VideoComparator:
             fps = cap.get(cv2.CAP_PROP_FPS) or 30
             duration = total_frames / fps
 
-            # Calculate frame intervals for even distribution
-            if total_frames > max_frames:
-                frame_interval = total_frames // max_frames
+            if total_frames > 0:
+                # Seek straight to evenly distributed targets so only
+                # max_frames frames are decoded instead of the whole video
+                targets = np.unique(np.linspace(0, total_frames - 1, max_frames, dtype=int))
+                seekable = True
+                position = 0  # index of the next frame read() returns
+
+                for target in targets:
+                    if seekable:
+                        # Frame-exact seek, else settle for the nearest keyframe
+                        seekable = (cap.set(cv2.CAP_PROP_POS_FRAMES, int(target))
+                                    or cap.set(cv2.CAP_PROP_POS_MSEC, target / fps * 1000.0))
+                    if not seekable:
+                        # No seeking at all: step over the gap with grab().
+                        # grab() still decodes each frame (only the colour
+                        # conversion is skipped), so this walk costs one
+                        # sequential decode of the video up to the last target
+                        while position < target and cap.grab():
+                            position += 1
+
+                    ret, frame = cap.read()
+                    if seekable and ret:
+                        # The backend reports the decoded frame's position; a
+                        # mismatch means the index isn't frame-accurate (GOP
+                        # misalignment). Rewind once and walk the rest of this
+                        # video with grab(): later targets continue from here,
+                        # so the fallback decodes the video at most once in total
+                        reported = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
+                        if reported > 0 and reported != target + 1:
+                            logger.info("Inaccurate seeks in %s, decoding sequentially", video_path)
+                            seekable = False
+                            cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                            position = 0
+                            while position < target and cap.grab():
+                                position += 1
+                            ret, frame = cap.read()
+                    position = int(target) + 1
+                    if not ret:
+                        continue
+
+                    frames.append(frame)
+                    if on_frame is not None:
+                        on_frame(frame)
             else:
-                frame_interval = 1
-
-            frame_count = 0
-            extracted_count = 0
+                # Frame count unknown (e.g. some live/streamed containers):
+                # read from the start
+                while cap.isOpened() and len(frames) < max_frames:
+                    ret, frame = cap.read()
+                    if not ret:
+                        break
 
-            while cap.isOpened() and extracted_count < max_frames:
-                ret, frame = cap.read()
-                if not ret:
-                    break
-
-                if frame_count % frame_interval == 0:
-                    # Save frame as temporary file
-                    frame_filename = f"frame_{extracted_count:04d}.jpg"
-                    frame_path = os.path.join(temp_dir, frame_filename)
-                    cv2.imwrite(frame_path, frame)
-                    frame_paths.append(frame_path)
-                    extracted_count += 1
-
-                frame_count += 1
+                    frames.append(frame)
+                    if on_frame is not None:
+                        on_frame(frame)
 
             cap.release()
-            logger.info(f"Extracted {len(frame_paths)} frames from {video_path}")
-            return frame_paths
+            logger.info("Extracted %d frames from %s", len(frames), video_path)
+            return frames, VideoMeta(fps=fps, total_frames=total_frames, duration=duration)
 
         except Exception as e:
-            logger.error(f"Frame extraction failed: {str(e)}")
-            # Clean up on failure
-            for path in frame_paths:
-                if os.path.exists(path):
-                    os.remove(path)
-            if os.path.exists(temp_dir):
-                os.rmdir(temp_dir)
+            logger.error("Frame extraction failed: %s", e)
             raise
 
+    def _read_frames_decord(self, video_path: str, max_frames: int) -> Tuple[List[np.ndarray], VideoMeta]:
+        """
+        Decode only the sampled frames with decord, which seeks to the
+        nearest keyframe per target and decodes the batch in one call
+        """
+        reader = decord.VideoReader(video_path, ctx=decord.cpu(0), num_threads=self.decode_threads)
+        total_frames = len(reader)
+        fps = reader.get_avg_fps() or 30
+        duration = total_frames / fps
+
+        frames = []
+        if total_frames > 0:
+            targets = np.unique(np.linspace(0, total_frames - 1, max_frames, dtype=int))
+            batch = reader.get_batch(targets.tolist()).asnumpy()
+            # decord decodes to RGB; the feature pipeline expects OpenCV's BGR
+            frames = [np.ascontiguousarray(rgb[:, :, ::-1]) for rgb in batch]
+
+        return frames, VideoMeta(fps=fps, total_frames=total_frames, duration=duration)
+
     def extract_video_features(self, video_path: str, max_frames: int = 10) -> List[FrameFeatures]:
         """
         Extract features from video frames for analysis
         """
         features_list = []
-        frame_paths = []
+        keys = []
+        cached = []
+        futures = []
+        shared_frames = []
+        pool = self._get_process_pool() if self.max_workers > 1 else None
+
+        def submit(frame: np.ndarray):
+            # Called as each frame is decoded, so workers generate features
+            # while the extractor seeks to and decodes the next one
+            key = f"frame:{frame_digest(frame)}" if self.feature_cache is not None else None
+            # Frames seen before (same content) reuse their cached results
+            hit = self._get_cached_features(key) if key is not None else None
+            future = None
+            if hit is None and pool is not None:
+                # Hand pixels to the worker through shared memory rather
+                # than pickling each frame down the pool's pipe
+                shm = shared_memory.SharedMemory(create=True, size=frame.nbytes)
+                shared_frames.append(shm)
+                np.ndarray(frame.shape, dtype=frame.dtype, buffer=shm.buf)[:] = frame
+                future = pool.submit(_extract_shared_frame, shm.name, frame.shape, frame.dtype.str)
+            keys.append(key)
+            cached.append(hit)
+            futures.append(future)
 
         try:
-            # Extract frames
-            frame_paths = self.extract_frames_from_video(video_path, max_frames)
-
-            # Get video metadata
-            cap = cv2.VideoCapture(video_path)
-            fps = cap.get(cv2.CAP_PROP_FPS) or 30
-            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-            duration = total_frames / fps
-            cap.release()
+            # Extract frames, generating features for each as it arrives
+            frames, meta = self.extract_frames_from_video(video_path, max_frames, on_frame=submit)
+            duration = meta.duration
+
+            # Collect per-frame results: cached, from the pool, or inline
+            results = list(cached)
+            fresh = [i for i, hit in enumerate(cached) if hit is None]
+            if pool is None:
+                batch = self.hash_generator.generate_all_features_batch([frames[i] for i in fresh])
+                for i, frame_features in zip(fresh, batch):
+                    results[i] = _feature_tuple(frame_features)
+            else:
+                for i in fresh:
+                    try:
+                        results[i] = futures[i].result()
+                    except Exception as e:
+                        if logger.isEnabledFor(logging.WARNING):
+                            logger.warning("Failed to process frame %d: %s", i, e)
+                self._embed_results(frames, results, fresh)
+
+            for i in fresh:
+                if keys[i] is not None and results[i] is not None:
+                    self._put_cached_features(keys[i], results[i])
 
             # Process each frame
-            for i, frame_path in enumerate(frame_paths):
+            for i, frame in enumerate(frames):
+                if results[i] is None:
+                    continue
                 try:
-                    # Generate all features for this frame
-                    frame_features = self.hash_generator.generate_all_features(frame_path)
+                    phash, dct_hash, tf_embedding, advanced_features = results[i]
 
-                    # Calculate timestamp
-                    timestamp = (i / len(frame_paths)) * duration
+                    # Frame dimensions straight from the decoded array
+                    height, width = frame.shape[:2]
 
-                    # Get frame dimensions
-                    img = cv2.imread(frame_path)
-                    height, width = img.shape[:2] if img is not None else (0, 0)
+                    # Calculate timestamp
+                    timestamp = (i / len(frames)) * duration
 
                     features = FrameFeatures(
                         timestamp=timestamp,
-                        phash=frame_features.get('phash', ''),
-                        dct_hash=frame_features.get('dct_hash', ''),
-                        tf_embedding=frame_features.get('tf_embedding'),
-                        advanced_features=frame_features.get('advanced_features', {}),
-                        frame_path=frame_path,
+                        phash=phash,
+                        dct_hash=dct_hash,
+                        tf_embedding=tf_embedding,
+                        advanced_features=advanced_features,
                         width=width,
                         height=height
                     )
@@ -165,22 +647,63 @@ class VideoComparator:
                     features_list.append(features)
 
                 except Exception as e:
-                    logger.warning(f"Failed to process frame {i}: {str(e)}")
+                    if logger.isEnabledFor(logging.WARNING):
+                        logger.warning("Failed to process frame %d: %s", i, e)
                     continue
+        finally:
+            for shm in shared_frames:
+                shm.close()
+                shm.unlink()
 
-            # Add duration metadata to first feature
-            if features_list:
-                features_list[0].advanced_features['duration'] = duration
-                features_list[0].advanced_features['total_frames'] = total_frames
-                features_list[0].advanced_features['fps'] = fps
+        # Add duration metadata to first feature
+        if features_list:
+            features_list[0].advanced_features['duration'] = duration
+            features_list[0].advanced_features['total_frames'] = meta.total_frames
+            features_list[0].advanced_features['fps'] = meta.fps
 
-            return features_list
+        return features_list
 
-        finally:
-            # Clean up temporary frame files
-            for path in frame_paths:
-                if os.path.exists(path):
-                    os.remove(path)
+    def _embed_results(self, frames: List[np.ndarray], results: List[Optional[Tuple]],
+                       indices: List[int]):
+        """
+        Fill in TF embeddings for worker results in batched forward passes;
+        workers skip TF so the model is only loaded once, in this process
+        """
+        if not self.hash_generator.tf_available:
+            return
+        pending = [i for i in indices if results[i] is not None and results[i][0]]
+        if not pending:
+            return
+        try:
+            embeddings = self.hash_generator.embed_frames([frames[i] for i in pending])
+        except Exception as e:
+            logger.warning("Batched TensorFlow embedding failed: %s", e)
+            return
+        for i, embedding in zip(pending, embeddings):
+            phash, dct_hash, _, advanced_features = results[i]
+            results[i] = (phash, dct_hash, _unit_embedding(embedding), advanced_features)
+
+    def _get_cached_features(self, key: str) -> Optional[Tuple]:
+        """Cached _extract_one result for a frame digest, or None"""
+        entry = self.feature_cache.get(key)
+        if entry is None:
+            return None
+        # Entries written by app.py hold the raw float32 embedding, so
+        # normalize (a no-op for this module's own unit float16 ones);
+        # advanced_features gets per-video metadata added, so hand out a copy
+        return (entry['phash'], entry['dct_hash'], _unit_embedding(entry.get('tf_embedding')),
+                dict(entry['advanced_features']))
+
+    def _put_cached_features(self, key: str, result: Tuple):
+        phash, dct_hash, tf_embedding, advanced_features = result
+        if not phash:
+            return  # feature generation failed, let the next request retry
+        self.feature_cache.put(key, {
+            'phash': phash,
+            'dct_hash': dct_hash,
+            'tf_embedding': tf_embedding,
+            'advanced_features': dict(advanced_features)
+        })
 
     def calculate_frame_similarity(self, features1: FrameFeatures, features2: FrameFeatures) -> float:
         """
@@ -189,35 +712,30 @@ class VideoComparator:
         similarities = []
 
         try:
-            # pHash similarity (Hamming distance)
-            if features1.phash and features2.phash:
-                # Convert hex to binary and calculate Hamming distance
-                phash1_bin = bin(int(features1.phash, 16))[2:].zfill(64)
-                phash2_bin = bin(int(features2.phash, 16))[2:].zfill(64)
-                hamming_dist = sum(c1 != c2 for c1, c2 in zip(phash1_bin, phash2_bin))
+            # pHash similarity (Hamming distance via XOR + popcount)
+            if features1.phash_int is not None and features2.phash_int is not None:
+                hamming_dist = (features1.phash_int ^ features2.phash_int).bit_count()
                 phash_similarity = 1 - (hamming_dist / 64.0)
+                if phash_similarity < PHASH_CANDIDATE_SIMILARITY:
+                    return 0.0
                 similarities.append(phash_similarity)
 
             # DCT hash similarity
-            if features1.dct_hash and features2.dct_hash:
-                dct1_bin = bin(int(features1.dct_hash, 16))[2:].zfill(64)
-                dct2_bin = bin(int(features2.dct_hash, 16))[2:].zfill(64)
-                dct_hamming = sum(c1 != c2 for c1, c2 in zip(dct1_bin, dct2_bin))
+            if features1.dct_int is not None and features2.dct_int is not None:
+                dct_hamming = (features1.dct_int ^ features2.dct_int).bit_count()
                 dct_similarity = 1 - (dct_hamming / 64.0)
                 similarities.append(dct_similarity)
 
-            # TensorFlow embedding similarity (cosine)
-            if (features1.tf_embedding and features2.tf_embedding and 
-                len(features1.tf_embedding) > 0 and len(features2.tf_embedding) > 0):
-                tf_similarity = 1 - cosine(features1.tf_embedding, features2.tf_embedding)
+            # TensorFlow embedding similarity (cosine of unit vectors)
+            if _has_embedding(features1) and _has_embedding(features2):
+                dot = int(np.dot(features1.tf_embedding.astype(np.int32),
+                                 features2.tf_embedding.astype(np.int32)))
+                tf_similarity = dot * features1.tf_scale * features2.tf_scale
                 similarities.append(tf_similarity)
 
             # Advanced features similarity (brightness, contrast, etc.)
             if features1.advanced_features and features2.advanced_features:
-                advanced_sim = self._calculate_advanced_similarity(
-                    features1.advanced_features, 
-                    features2.advanced_features
-                )
+                advanced_sim = self._calculate_advanced_similarity(features1, features2)
                 similarities.append(advanced_sim)
 
             # Return weighted average
@@ -227,33 +745,121 @@ class VideoComparator:
                 return 0.0
 
         except Exception as e:
-            logger.error(f"Frame similarity calculation failed: {str(e)}")
+            logger.error("Frame similarity calculation failed: %s", e)
             return 0.0
 
-    def _calculate_advanced_similarity(self, features1: Dict, features2: Dict) -> float:
+    def calculate_similarity_matrix(self, features1, features2) -> np.ndarray:
+        """
+        calculate_frame_similarity for every (features1[i], features2[j]) pair,
+        computed with whole-array NumPy operations instead of an N x M loop.
+        Accepts FrameFeatures lists or prebuilt FrameFeaturesBatch columns
+        """
+        batch1 = features1 if isinstance(features1, FrameFeaturesBatch) else FrameFeaturesBatch.from_features(features1)
+        batch2 = features2 if isinstance(features2, FrameFeaturesBatch) else FrameFeaturesBatch.from_features(features2)
+        n, m = len(batch1), len(batch2)
+
+        # pHash similarity first: it decides which pairs are worth the rest
+        phash_similarity, phash_valid = _hamming_similarity_matrix(
+            batch1.phash, batch1.phash_ok, batch2.phash, batch2.phash_ok)
+        pruned = phash_valid & (phash_similarity < PHASH_CANDIDATE_SIMILARITY)
+
+        # Fast reject: no pair is a candidate, so every score is 0.0
+        if pruned.all():
+            return np.zeros((n, m), dtype=np.float64)
+
+        emb1, emb2 = _match_embedding_dims(batch1, batch2)
+
+        if _score_matrix_kernel is not None and batch1.hashes_fit_u64 and batch2.hashes_fit_u64:
+            return _score_matrix_kernel(batch1.phash, batch1.phash_ok, batch2.phash, batch2.phash_ok,
+                                        batch1.dct, batch1.dct_ok, batch2.dct, batch2.dct_ok,
+                                        emb1, batch1.embedding_scales, batch1.embedding_ok,
+                                        emb2, batch2.embedding_scales, batch2.embedding_ok,
+                                        batch1.advanced, batch1.colors, batch1.advanced_ok,
+                                        batch2.advanced, batch2.colors, batch2.advanced_ok,
+                                        PHASH_CANDIDATE_SIMILARITY)
+
+        totals = np.zeros((n, m), dtype=np.float64)
+        counts = np.zeros((n, m), dtype=np.int64)
+
+        def add(similarity, valid):
+            totals[valid] += similarity[valid]
+            counts[valid] += 1
+
+        add(phash_similarity, phash_valid)
+
+        # Frames with no candidate pair at all are left out of the
+        # embedding and advanced feature computations
+        rows = ~pruned.all(axis=1)
+        cols = ~pruned.all(axis=0)
+
+        # DCT hash similarity (Hamming distance)
+        add(*_hamming_similarity_matrix(batch1.dct, batch1.dct_ok, batch2.dct, batch2.dct_ok))
+
+        # TensorFlow embedding similarity (cosine) as one GEMM of unit vectors
+        has_emb1 = batch1.embedding_ok & rows
+        has_emb2 = batch2.embedding_ok & cols
+        if has_emb1.any() and has_emb2.any():
+            # Widen the int8 codes to float32 so the product runs through BLAS
+            # sgemm (NumPy has no int8 GEMM), then apply the per-vector scales
+            codes1 = emb1[has_emb1].astype(np.float32)
+            codes2 = emb2[has_emb2].astype(np.float32)
+            scale1 = batch1.embedding_scales[has_emb1]
+            scale2 = batch2.embedding_scales[has_emb2]
+            cosine_sim = np.zeros((n, m), dtype=np.float64)
+            cosine_sim[np.ix_(has_emb1, has_emb2)] = (codes1 @ codes2.T) * scale1[:, None] * scale2[None, :]
+            add(cosine_sim, has_emb1[:, None] & has_emb2[None, :])
+
+        # Advanced features similarity (brightness, contrast, etc.)
+        has_adv1 = batch1.advanced_ok & rows
+        has_adv2 = batch2.advanced_ok & cols
+        if has_adv1.any() and has_adv2.any():
+            advanced_sim = np.zeros((n, m), dtype=np.float64)
+            advanced_sim[np.ix_(has_adv1, has_adv2)] = self._advanced_similarity_matrix(
+                batch1.advanced[has_adv1], batch1.colors[has_adv1],
+                batch2.advanced[has_adv2], batch2.colors[has_adv2])
+            add(advanced_sim, has_adv1[:, None] & has_adv2[None, :])
+
+        # Average of the available components per pair
+        similarity = np.divide(totals, counts, out=np.zeros_like(totals), where=counts > 0)
+        similarity[pruned] = 0.0
+        return similarity
+
+    def _advanced_similarity_matrix(self, advanced1: np.ndarray, colors1: np.ndarray,
+                                    advanced2: np.ndarray, colors2: np.ndarray) -> np.ndarray:
+        """_calculate_advanced_similarity for every pair, as an (N, M) array"""
+        values1 = advanced1[:, None, :]
+        values2 = advanced2[None, :, :]
+        # Only features present and positive on both sides are compared
+        valid = (values1 > 0) & (values2 > 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            similarity = 1 - np.abs(values1 - values2) / np.maximum(values1, values2)
+        totals = np.where(valid, similarity, 0.0).sum(axis=-1)
+        counts = valid.sum(axis=-1)
+
+        # Dominant colors still contribute the fixed 0.5 placeholder
+        colors = colors1[:, None] & colors2[None, :]
+        totals = totals + 0.5 * colors
+        counts = counts + colors
+
+        return np.divide(totals, counts, out=np.zeros_like(totals), where=counts > 0)
+
+    def _calculate_advanced_similarity(self, features1: FrameFeatures, features2: FrameFeatures) -> float:
         """Calculate similarity based on advanced features"""
-        try:
-            similarities = []
+        values1, values2 = features1.advanced_vector, features2.advanced_vector
 
-            # Compare numerical features
-            numerical_features = ['brightness', 'contrast', 'complexity', 'edge_density']
-            for feature in numerical_features:
-                if feature in features1 and feature in features2:
-                    val1, val2 = features1[feature], features2[feature]
-                    if val1 > 0 and val2 > 0:  # Avoid division by zero
-                        similarity = 1 - abs(val1 - val2) / max(val1, val2)
-                        similarities.append(similarity)
+        # Compare numerical features present and positive on both sides
+        valid = (values1 > 0) & (values2 > 0)
+        values1, values2 = values1[valid], values2[valid]
+        total = float(np.sum(1 - np.abs(values1 - values2) / np.maximum(values1, values2)))
+        count = int(np.count_nonzero(valid))
 
-            # Compare dominant colors (simplified)
-            if 'dominant_colors' in features1 and 'dominant_colors' in features2:
-                # This is a simplified comparison - could be enhanced
-                similarities.append(0.5)  # Placeholder
+        # Compare dominant colors (simplified)
+        if 'dominant_colors' in features1.advanced_features and 'dominant_colors' in features2.advanced_features:
+            # This is a simplified comparison - could be enhanced
+            total += 0.5  # Placeholder
+            count += 1
 
-            return sum(similarities) / len(similarities) if similarities else 0.0
-
-        except Exception as e:
-            logger.error(f"Advanced similarity calculation failed: {str(e)}")
-            return 0.0
+        return total / count if count else 0.0
 
     def analyze_video_similarity(self, original_path: str, suspected_path: str, 
                                max_frames: int = 20) -> SimilarityResult:
@@ -262,50 +868,48 @@ class VideoComparator:
         """
         try:
             # Extract features from both videos
-            logger.info(f"Analyzing similarity between {original_path} and {suspected_path}")
+            logger.info("Analyzing similarity between %s and %s", original_path, suspected_path)
 
-            original_features = self.extract_video_features(original_path, max_frames)
-            suspected_features = self.extract_video_features(suspected_path, max_frames)
+            # Both videos are extracted concurrently; each feeds the process pool
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                original_future = executor.submit(self.extract_video_features, original_path, max_frames)
+                suspected_future = executor.submit(self.extract_video_features, suspected_path, max_frames)
+                original_features = original_future.result()
+                suspected_features = suspected_future.result()
 
             if not original_features or not suspected_features:
                 raise Exception("Could not extract features from one or both videos")
 
-            # Find best matches between frames
-            matched_frames = []
-            frame_similarities = []
-
-            for i, orig_frame in enumerate(original_features):
-                best_match_similarity = 0.0
-                best_match_index = -1
-
-                for j, susp_frame in enumerate(suspected_features):
-                    similarity = self.calculate_frame_similarity(orig_frame, susp_frame)
-                    if similarity > best_match_similarity:
-                        best_match_similarity = similarity
-                        best_match_index = j
-
-                if best_match_similarity > 0.3:  # Threshold for considering a match
-                    matched_frames.append({
-                        "original_frame": i,
-                        "suspected_frame": best_match_index,
-                        "similarity": best_match_similarity,
-                        "original_timestamp": orig_frame.timestamp,
-                        "suspected_timestamp": suspected_features[best_match_index].timestamp
-                    })
-
-                frame_similarities.append(best_match_similarity)
+            # Find best matches between frames: every pair is scored once
+            # and the per-frame bests, matches and timing all read from it
+            original_batch = FrameFeaturesBatch.from_features(original_features)
+            suspected_batch = FrameFeaturesBatch.from_features(suspected_features)
+            similarity_matrix = self.calculate_similarity_matrix(original_batch, suspected_batch)
+            best_indices = similarity_matrix.argmax(axis=1)
+            best_scores = np.maximum(similarity_matrix[np.arange(len(original_features)), best_indices], 0.0)
+
+            matched = np.flatnonzero(best_scores > 0.3)  # Threshold for considering a match
+            original_timestamps = original_batch.timestamps
+            suspected_timestamps = suspected_batch.timestamps[best_indices]
+
+            matched_frames = [
+                {
+                    "original_frame": int(i),
+                    "suspected_frame": int(best_indices[i]),
+                    "similarity": float(best_scores[i]),
+                    "original_timestamp": float(original_timestamps[i]),
+                    "suspected_timestamp": float(suspected_timestamps[i])
+                }
+                for i in matched
+            ]
 
             # Calculate overall metrics
-            visual_similarity = sum(frame_similarities) / len(frame_similarities)
+            visual_similarity = float(best_scores.mean())
 
             # Temporal alignment (how well the timing matches)
             temporal_alignment = 0.0
-            if matched_frames:
-                time_diffs = []
-                for match in matched_frames:
-                    time_diff = abs(match["original_timestamp"] - match["suspected_timestamp"])
-                    time_diffs.append(time_diff)
-                avg_time_diff = sum(time_diffs) / len(time_diffs)
+            if matched.size:
+                avg_time_diff = float(np.abs(original_timestamps[matched] - suspected_timestamps[matched]).mean())
                 # Convert to similarity score (lower diff = higher similarity)
                 temporal_alignment = max(0.0, 1.0 - (avg_time_diff / 30.0))  # 30 sec max diff
 
@@ -314,9 +918,9 @@ class VideoComparator:
             overall_confidence = (visual_similarity * 0.6 + temporal_alignment * 0.2 + match_ratio * 0.2)
 
             result = SimilarityResult(
-                visual_similarity=round(visual_similarity, 4),
-                temporal_alignment=round(temporal_alignment, 4),
-                overall_confidence=round(overall_confidence, 4),
+                visual_similarity=visual_similarity,
+                temporal_alignment=temporal_alignment,
+                overall_confidence=overall_confidence,
                 matched_frames=matched_frames,
                 frame_count_original=len(original_features),
                 frame_count_suspected=len(suspected_features),
@@ -329,14 +933,16 @@ class VideoComparator:
                 }
             )
 
-            logger.info(f"Analysis complete: {overall_confidence:.2%} confidence")
+            logger.info("Analysis complete: %.2f%% confidence", overall_confidence * 100)
             return result
 
         except Exception as e:
-            logger.error(f"Video similarity analysis failed: {str(e)}")
+            logger.error("Video similarity analysis failed: %s", e)
             raise
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
     # Test functionality if run directly
     comparator = VideoComparator()
     health = comparator.health_check()
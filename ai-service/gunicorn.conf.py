@@ -0,0 +1,26 @@
+# Gunicorn config for the Copyright Shield AI service
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+
+# Separate processes sidestep the GIL; threads help too since OpenCV decode
+# and SHA-256 release it
+worker_class = "gthread"
+workers = int(os.environ.get("WORKERS", 4))
+threads = int(os.environ.get("THREADS", 4))
+
+# Certificate generation on a 100MB upload can take a while
+timeout = int(os.environ.get("MAX_PROCESSING_TIME_SECONDS", 300))
+
+# TensorFlow is not fork-safe: let each worker import the app (and load its
+# models) after forking instead of preloading in the master
+preload_app = False
+
+accesslog = "-"
+errorlog = "-"
+
+
+def post_worker_init(worker):
+    # Load the TF-backed engines once per worker, before it takes requests
+    from app import init_engines
+    init_engines()
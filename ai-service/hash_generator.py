@@ -1,120 +1,351 @@
 #!/usr/bin/env python3
 
+import os
 import sys
-import json
+import orjson
+import tempfile
+import threading
+import base64
 import numpy as np
 from PIL import Image
-import imagehash
 import cv2
-from scipy.fft import dct
-import tensorflow as tf
-import tensorflow_hub as hub
-from datetime import datetime
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from datetime import datetime, timezone
+
+# Numba is optional; without it hash bits are packed with NumPy
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+# TensorFlow is imported when a model is first loaded (see
+# _import_tensorflow), so hash-only processes such as the spawned frame
+# extraction workers never pay for the TF import
+tf = None
+hub = None
+
+def _import_tensorflow():
+    global tf, hub
+    if tf is None:
+        import tensorflow
+        import tensorflow_hub
+        tf, hub = tensorflow, tensorflow_hub
+
+@lru_cache(maxsize=None)
+def _build_dct_basis(rows, size):
+    """
+    First `rows` rows of the orthonormal DCT-II matrix for `size` points, so
+    C @ img @ C.T is the top-left rows x rows block of the 2-D DCT.
+    Memoized and read-only: every caller shares one table per shape
+    """
+    k = np.arange(rows)[:, None]
+    n = np.arange(size)[None, :]
+    basis = np.sqrt(2.0 / size) * np.cos(np.pi * (n + 0.5) * k / size)
+    basis[0] /= np.sqrt(2.0)
+    basis = np.ascontiguousarray(basis, dtype=np.float32)
+    basis.flags.writeable = False
+    return basis
+
+if njit is not None:
+    @njit(cache=True)
+    def _threshold_pack(flat, start):
+        """
+        Median-threshold a flattened low-frequency block and pack the bits
+        MSB first (same layout as np.packbits). The median is taken over
+        flat[start:], so start=1 leaves out the DC term
+        """
+        median = np.median(flat[start:])
+        out = np.zeros(flat.size // 8, np.uint8)
+        for i in range(out.size):
+            byte = 0
+            for j in range(8):
+                byte = (byte << 1) | (1 if flat[i * 8 + j] > median else 0)
+            out[i] = byte
+        return out
+else:
+    def _threshold_pack(flat, start):
+        return np.packbits(flat > np.median(flat[start:]))
+
+def _utc_timestamp():
+    """Current UTC time as an ISO 8601 string, to the second"""
+    return datetime.now(timezone.utc).isoformat(timespec='seconds')
+
+# Dynamic-range quantization speeds up CPU inference but moves embeddings
+# away from the float model's (and so from GPU hosts'); opt in only
+TFLITE_QUANTIZE = os.environ.get('TFLITE_QUANTIZE', '0') == '1'
+
+# Converted TFLite copy of the feature extractor, shared by every process
+TFLITE_MODEL_PATH = os.environ.get(
+    'TFLITE_MODEL_PATH',
+    os.path.join(tempfile.gettempdir(),
+                 'mobilenet_v2_100_224_feature_vector' + ('_int8' if TFLITE_QUANTIZE else '') + '.tflite'))
+
+# Interpreter threads per process. Every gunicorn worker runs its own
+# interpreter, so split the cores between WORKERS rather than giving each
+# all of them
+TFLITE_NUM_THREADS = int(os.environ.get(
+    'TFLITE_NUM_THREADS', max(1, (os.cpu_count() or 1) // int(os.environ.get('WORKERS', 1)))))
 
 class HashGenerator:
-    def __init__(self):
+    # Fixed-size DCT bases, built once at import
+    _C8x32 = _build_dct_basis(8, 32)
+    _C16x64 = _build_dct_basis(16, 64)
+
+    # Image files remembered by generate_all_features
+    FILE_CACHE_SIZE = 256
+
+    def __init__(self, load_tf_model=True):
+        # LRU of file features keyed by (path, mtime, size), so re-certifying
+        # an unchanged file skips the whole pipeline
+        self._file_cache = OrderedDict()
+        self._file_cache_lock = threading.Lock()
+
+        # Hash-only instances (e.g. extraction workers whose embeddings are
+        # batched elsewhere) skip the multi-second model load entirely
+        self._tflite = None
+        self.embedding_backend = None
+        if not load_tf_model:
+            self.feature_extractor = None
+            self._fx = None
+            self.tf_available = False
+            return
+
         # Load TensorFlow Hub model for feature extraction
         try:
+            _import_tensorflow()
             # Using MobileNetV2 for semantic features (lighter than CLIP)
             self.feature_extractor = hub.load("https://tfhub.dev/google/imagenet/mobilenet_v2_100_224/feature_vector/5")
+            # One concrete function for every batch size: calls skip per-call
+            # retracing and the SavedModel's Python argument handling
+            self._fx = tf.function(
+                lambda x: self.feature_extractor(x),
+                input_signature=[tf.TensorSpec([None, 224, 224, 3], tf.float32)])
             self.tf_available = True
+            self.embedding_backend = 'tensorflow'
             print("TensorFlow feature extractor loaded successfully", file=sys.stderr)
+
+            # CPU-only hosts run inference through TFLite (XNNPACK) instead
+            # of the full TF runtime; TFLITE_EMBEDDINGS=0 opts out
+            if os.environ.get('TFLITE_EMBEDDINGS', '1') != '0':
+                self._tflite = self._load_tflite_interpreter()
+                if self._tflite is not None:
+                    self.embedding_backend = 'tflite-int8' if TFLITE_QUANTIZE else 'tflite'
         except Exception as e:
             print(f"TensorFlow model unavailable: {e}", file=sys.stderr)
+            self.feature_extractor = None
+            self._fx = None
             self.tf_available = False
+            self.embedding_backend = None
+
+    def _load(self, image_path):
+        """
+        Decode an image file once for all feature helpers.
+        Returns (bgr, gray), or (None, None) when OpenCV can't read it
+        """
+        bgr = cv2.imread(image_path)
+        if bgr is None:
+            return None, None
+        return bgr, cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
 
-    def generate_phash(self, image_path):
-        """Generate perceptual hash using imagehash library"""
+    def _load_tflite_interpreter(self):
+        """
+        TFLite interpreter for the feature extractor with a [None, 224, 224, 3]
+        input, converted once (quantized only with TFLITE_QUANTIZE=1) and
+        cached at TFLITE_MODEL_PATH. Returns None, keeping the TF path, when
+        a GPU is available or on failure
+        """
         try:
-            with Image.open(image_path) as img:
-                # Convert to grayscale and resize for consistency
-                img = img.convert('L').resize((32, 32), Image.Resampling.LANCZOS)
-                phash = imagehash.phash(img, hash_size=16)
-                return str(phash)
+            if tf.config.list_physical_devices('GPU'):
+                return None
+
+            if not os.path.exists(TFLITE_MODEL_PATH):
+                concrete = tf.function(
+                    lambda x: self.feature_extractor(x),
+                    input_signature=[tf.TensorSpec([None, 224, 224, 3], tf.float32)]).get_concrete_function()
+                converter = tf.lite.TFLiteConverter.from_concrete_functions([concrete], self.feature_extractor)
+                if TFLITE_QUANTIZE:
+                    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+                model = converter.convert()
+
+                # Write-then-rename so concurrent workers never read a partial file
+                fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(TFLITE_MODEL_PATH))
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(model)
+                os.replace(tmp_path, TFLITE_MODEL_PATH)
+
+            interpreter = tf.lite.Interpreter(model_path=TFLITE_MODEL_PATH, num_threads=TFLITE_NUM_THREADS)
+            interpreter.allocate_tensors()
+            self._tflite_input = interpreter.get_input_details()[0]['index']
+            self._tflite_output = interpreter.get_output_details()[0]['index']
+            self._tflite_batch = None
+            # An interpreter holds its tensors in place; one invoke at a time
+            self._tflite_lock = threading.Lock()
+            print(f"TFLite feature extractor ready ({TFLITE_NUM_THREADS} threads)", file=sys.stderr)
+            return interpreter
+
         except Exception as e:
-            print(f"pHash generation failed: {e}", file=sys.stderr)
+            print(f"TFLite conversion unavailable, using TensorFlow: {e}", file=sys.stderr)
             return None
 
-    def generate_dct_hash(self, image_path):
-        """Generate DCT-based hash for more robust comparison"""
+    def _run_feature_extractor(self, batch):
+        """Embeddings for a [N, 224, 224, 3] float32 batch, as an (N, D) float32 ndarray"""
+        if self._tflite is None:
+            return self._fx(batch).numpy().astype(np.float32)
+
+        batch = np.ascontiguousarray(batch, dtype=np.float32)
+        with self._tflite_lock:
+            # Whole batch in one invoke; reallocate only when its size changes
+            if self._tflite_batch != len(batch):
+                self._tflite.resize_tensor_input(self._tflite_input, batch.shape)
+                self._tflite.allocate_tensors()
+                self._tflite_batch = len(batch)
+            self._tflite.set_tensor(self._tflite_input, batch)
+            self._tflite.invoke()
+            return self._tflite.get_tensor(self._tflite_output).astype(np.float32)
+
+    def generate_phash(self, image_path, img_gray=None):
+        """Generate 256-bit perceptual hash (16x16 low-frequency DCT block)"""
         try:
-            # Read and preprocess image
-            img = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
-            if img is None:
-                raise ValueError(f"Could not read image: {image_path}")
+            gray = img_gray
+            if gray is None:
+                gray = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+            if gray is None:
+                # Formats OpenCV can't decode (e.g. GIF) still go through PIL
+                with Image.open(image_path) as img:
+                    gray = np.asarray(img.convert('L'))
+            return self._phash_from_gray(gray)
+        except Exception as e:
+            print(f"pHash generation failed: {e}", file=sys.stderr)
+            return None
 
-            # Resize to standard size
-            img = cv2.resize(img, (32, 32))
+    def _phash_from_gray(self, gray):
+        """
+        Same scheme as imagehash.phash(hash_size=16): 64x64 downscale, 16x16
+        low-frequency DCT block, median threshold. One resize and two small
+        matmuls against the cached basis
+        """
+        img = cv2.resize(gray, (64, 64), interpolation=cv2.INTER_AREA).astype(np.float32)
+        low_freq = self._C16x64 @ img @ self._C16x64.T
+        return _threshold_pack(low_freq.ravel(), 0).tobytes().hex()
 
-            # Apply DCT
-            dct_coeffs = dct(dct(img.T, norm='ortho').T, norm='ortho')
+    def _low_freq_8x8(self, img):
+        """Top-left 8x8 block of the 2-D DCT of a 32x32 image"""
+        return self._C8x32 @ img.astype(np.float32) @ self._C8x32.T
 
-            # Take low-frequency coefficients (top-left 8x8)
-            low_freq = dct_coeffs[:8, :8]
+    def _phash_from_low_freq(self, low_freq):
+        """64-bit pHash from the top-left 8x8 DCT coefficients"""
+        # Median excludes the DC term, which only encodes mean brightness
+        return _threshold_pack(low_freq.flatten(), 1).tobytes().hex()
 
-            # Generate binary hash based on median
-            median = np.median(low_freq)
-            hash_binary = (low_freq > median).astype(int)
+    def phash_from_array(self, small):
+        """64-bit pHash of a grayscale frame already resized to 32x32"""
+        return self._phash_from_low_freq(self._low_freq_8x8(small))
 
-            # Convert to hex string
-            hash_string = ''.join(str(bit) for row in hash_binary for bit in row)
-            hash_hex = hex(int(hash_string, 2))[2:]
+    def generate_dct_hash(self, image_path, img_gray=None):
+        """Generate DCT-based hash for more robust comparison"""
+        try:
+            # Read and preprocess image
+            img = img_gray
+            if img is None:
+                img = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+            if img is None:
+                raise ValueError(f"Could not read image: {image_path}")
 
-            return hash_hex
+            return self._dct_hash_from_gray(img)
 
         except Exception as e:
             print(f"DCT hash generation failed: {e}", file=sys.stderr)
             return None
 
-    def extract_advanced_features(self, image_path):
+    def _dct_hash_from_gray(self, img):
+        """DCT hash of a decoded grayscale ndarray"""
+        # Resize to standard size
+        img = cv2.resize(img, (32, 32))
+
+        # Only the low-frequency coefficients (top-left 8x8) are used, so
+        # compute just that block of the 2-D DCT as two small matmuls
+        return self._dct_hash_from_low_freq(self._low_freq_8x8(img))
+
+    def _dct_hash_from_low_freq(self, low_freq):
+        """DCT hash from the top-left 8x8 DCT coefficients"""
+        # Binary hash based on the median, packed row-major (MSB first)
+        # into 8 bytes of hex
+        return _threshold_pack(low_freq.flatten(), 0).tobytes().hex()
+
+    def extract_advanced_features(self, image_path, img_bgr=None, img_gray=None):
         """Extract advanced visual features"""
         try:
             # Read image
-            img = cv2.imread(image_path)
+            img = img_bgr
+            if img is None:
+                img = cv2.imread(image_path)
             if img is None:
                 return {}
 
-            # Convert to different color spaces
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-            hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
-
-            # Basic statistics
-            brightness = np.mean(gray)
-            contrast = np.std(gray)
-
-            # Complexity (edge density)
-            edges = cv2.Canny(gray, 50, 150)
-            edge_density = np.sum(edges > 0) / edges.size
-
-            # Dominant colors (simplified)
-            dominant_colors = self._extract_dominant_colors(img)
-
-            # Texture features (using Local Binary Pattern concept, simplified)
-            texture_complexity = np.std(cv2.Laplacian(gray, cv2.CV_64F))
-
-            return {
-                'brightness': float(brightness),
-                'contrast': float(contrast),
-                'edge_density': float(edge_density),
-                'complexity': float(texture_complexity),
-                'dominant_colors': dominant_colors,
-                'image_dimensions': img.shape[:2]
-            }
+            return self._advanced_features_from_bgr(img, img_gray)
 
         except Exception as e:
             print(f"Advanced feature extraction failed: {e}", file=sys.stderr)
             return {}
 
+    def _advanced_features_from_bgr(self, img, gray=None):
+        """Advanced visual features of a decoded BGR ndarray"""
+        # Convert to grayscale (unless the caller already has it)
+        if gray is None:
+            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+
+        # Basic statistics, mean and std in one pass
+        mean, stddev = cv2.meanStdDev(gray)
+        brightness = mean[0, 0]
+        contrast = stddev[0, 0]
+
+        # Edge and texture statistics are coarse, so large images are
+        # measured on a copy downscaled to at most 512 px on the long side
+        h, w = gray.shape[:2]
+        scale = 512.0 / max(h, w)
+        if scale < 1:
+            gray_small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        else:
+            gray_small = gray
+
+        # Complexity (edge density)
+        edges = cv2.Canny(gray_small, 50, 150)
+        edge_density = cv2.countNonZero(edges) / float(edges.size)
+
+        # Dominant colors (simplified)
+        dominant_colors = self._extract_dominant_colors(img)
+
+        # Texture features (using Local Binary Pattern concept, simplified)
+        _, texture_std = cv2.meanStdDev(cv2.Laplacian(gray_small, cv2.CV_32F))
+        texture_complexity = texture_std[0, 0]
+
+        return {
+            'brightness': float(brightness),
+            'contrast': float(contrast),
+            'edge_density': float(edge_density),
+            'complexity': float(texture_complexity),
+            'dominant_colors': dominant_colors,
+            'image_dimensions': img.shape[:2]
+        }
+
     def _extract_dominant_colors(self, img, k=3):
         """Extract dominant colors using K-means clustering"""
         try:
             # Reshape image to be a list of pixels
             data = img.reshape((-1, 3))
+
+            # A fixed-seed subsample of pixels gives the same palette as the
+            # full image at a fraction of the K-means distance work
+            if data.shape[0] > 20000:
+                idx = np.random.default_rng(0).integers(0, data.shape[0], 20000)
+                data = data[idx]
             data = np.float32(data)
 
-            # Apply K-means
-            criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 10, 1.0)
-            _, labels, centers = cv2.kmeans(data, k, None, criteria, 10, cv2.KMEANS_RANDOM_CENTERS)
+            # Apply K-means; k-means++ seeding needs fewer restarts
+            criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 8, 1.0)
+            _, labels, centers = cv2.kmeans(data, k, None, criteria, 3, cv2.KMEANS_PP_CENTERS)
 
             # Convert centers to integers and return as list
             centers = np.uint8(centers)
@@ -124,44 +355,168 @@ class HashGenerator:
             print(f"Dominant color extraction failed: {e}", file=sys.stderr)
             return []
 
-    def generate_tf_embedding(self, image_path):
+    def generate_tf_embedding(self, image_path, img_bgr=None):
         """Generate TensorFlow embedding if available"""
         if not self.tf_available:
             return None
 
         try:
-            # Load and preprocess image
-            img = tf.io.read_file(image_path)
-            img = tf.image.decode_image(img, channels=3)
-            img = tf.image.resize(img, [224, 224])
-            img = tf.cast(img, tf.float32) / 255.0
-            img = tf.expand_dims(img, 0)
+            # Load and preprocess image, reusing an already decoded one
+            bgr = img_bgr if img_bgr is not None else cv2.imread(image_path)
+            if bgr is not None:
+                return self._tf_embedding_from_input(self.prepare_tf_input(bgr))
 
-            # Generate embedding
-            embedding = self.feature_extractor(img)
-            return embedding.numpy().flatten().tolist()
+            # Formats OpenCV can't decode (e.g. GIF) still go through TF
+            img = tf.io.read_file(image_path)
+            img = tf.image.decode_image(img, channels=3, expand_animations=False)
+            return self._tf_embedding_from_input(self._tf_input_from_rgb(img))
 
         except Exception as e:
             print(f"TensorFlow embedding failed: {e}", file=sys.stderr)
             return None
 
-    def generate_all_features(self, image_path):
+    def generate_tf_embeddings(self, image_paths, batch_size=16):
+        """
+        TensorFlow embeddings for many image files: decoding and resizing run
+        in a tf.data pipeline alongside inference, and the model sees
+        batch_size images per forward pass. Returns one float32 ndarray per
+        path, or None for every path when TF is unavailable or a batch fails
+        """
+        if not self.tf_available or not image_paths:
+            return [None] * len(image_paths)
+
+        try:
+            dataset = (tf.data.Dataset.from_tensor_slices(list(image_paths))
+                       .map(self._tf_input_from_file, num_parallel_calls=tf.data.AUTOTUNE)
+                       .batch(batch_size)
+                       .prefetch(tf.data.AUTOTUNE))
+
+            embeddings = []
+            for batch in dataset:
+                output = self._run_feature_extractor(batch)
+                embeddings.extend(row.ravel() for row in output)
+            return embeddings
+
+        except Exception as e:
+            print(f"TensorFlow batch embedding failed: {e}", file=sys.stderr)
+            return [None] * len(image_paths)
+
+    def _tf_input_from_file(self, image_path):
+        """Model input for an image file, as a tf.data map function"""
+        img = tf.image.decode_image(tf.io.read_file(image_path), channels=3,
+                                    expand_animations=False)
+        return self._tf_input_from_rgb(img)
+
+    def _tf_input_from_rgb(self, img):
+        """Resize and scale a decoded RGB image (HxWx3) to the model input"""
+        img = tf.image.resize(img, [224, 224])
+        return tf.cast(img, tf.float32) / 255.0
+
+    def _tf_embedding_from_input(self, tf_input):
+        """
+        TensorFlow embedding of one prepared model input, kept as a float32
+        ndarray (orjson serializes it directly; no Python float list)
+        """
+        return self.embed_batch([tf_input])[0]
+
+    def prepare_tf_input(self, bgr):
+        """
+        Model input for a decoded BGR frame. Lets callers keep only the small
+        224x224 array around until the whole batch is embedded at once.
+        Preprocessed in OpenCV (AREA resampling, no TF op dispatch)
+        """
+        rgb = cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
+        resized = cv2.resize(rgb, (224, 224), interpolation=cv2.INTER_AREA)
+        return resized.astype(np.float32) * (1.0 / 255.0)
+
+    def embed_batch(self, inputs, batch_size=16):
+        """
+        Generate TensorFlow embeddings for a list of prepared model inputs with
+        one forward pass per batch_size images instead of one per image.
+        Returns one float32 ndarray per input
+        """
+        embeddings = []
+        for start in range(0, len(inputs), batch_size):
+            batch = np.stack(inputs[start:start + batch_size]).astype(np.float32)
+            output = self._run_feature_extractor(batch)
+            embeddings.extend(row.ravel() for row in output)
+        return embeddings
+
+    def embed_frames(self, frames, batch_size=16):
+        """TensorFlow embeddings for decoded BGR frames, batch_size per forward pass"""
+        return self.embed_batch([self.prepare_tf_input(bgr) for bgr in frames], batch_size=batch_size)
+
+    @staticmethod
+    def quantize_embedding(embedding):
+        """
+        Symmetric int8 quantization of an embedding with one scale per vector,
+        base64-encoded for JSON. A quarter of the float32 size with well under
+        1% cosine error; dequantize as int8 * scale
+        """
+        emb = np.asarray(embedding, dtype=np.float32).ravel()
+        max_abs = float(np.abs(emb).max()) if emb.size else 0.0
+        scale = max_abs / 127.0 if max_abs > 0 else 1.0
+        q = np.clip(np.round(emb / scale), -127, 127).astype(np.int8)
+        return {
+            'q': base64.b64encode(q.tobytes()).decode('ascii'),
+            'scale': scale,
+            'dims': int(q.size)
+        }
+
+    def generate_all_features(self, image_path, include_tf_embedding=True, timestamp=None):
         """
         Generate all available features for comprehensive analysis
         Perfect for Copyright Shield certificate generation
+        Accepts an image path or an already decoded BGR frame; batch callers
+        pass one shared timestamp
         """
+        if isinstance(image_path, np.ndarray):
+            return self.generate_all_features_from_array(image_path, include_tf_embedding, timestamp)
+
+        try:
+            stat = os.stat(image_path)
+            key = (os.path.abspath(image_path), stat.st_mtime_ns, stat.st_size, include_tf_embedding)
+        except OSError:
+            key = None
+
+        if key is not None:
+            with self._file_cache_lock:
+                cached = self._file_cache.get(key)
+                if cached is not None:
+                    self._file_cache.move_to_end(key)
+            if cached is not None:
+                features = dict(cached, advanced_features=dict(cached['advanced_features']))
+                features['timestamp'] = timestamp or _utc_timestamp()
+                features['image_path'] = image_path
+                return features
+
+        features = self._generate_file_features(image_path, include_tf_embedding, timestamp)
+
+        if key is not None and 'error' not in features:
+            with self._file_cache_lock:
+                self._file_cache[key] = dict(features, advanced_features=dict(features['advanced_features']))
+                while len(self._file_cache) > self.FILE_CACHE_SIZE:
+                    self._file_cache.popitem(last=False)
+        return features
+
+    def _generate_file_features(self, image_path, include_tf_embedding=True, timestamp=None):
+        """generate_all_features for an image file, without the cache"""
         try:
+            # Decode once and share the arrays; when OpenCV can't read the
+            # file each helper falls back to its own reader
+            bgr, gray = self._load(image_path)
+
             features = {
-                'timestamp': datetime.utcnow().isoformat(),
+                'timestamp': timestamp or _utc_timestamp(),
                 'image_path': image_path,
-                'phash': self.generate_phash(image_path),
-                'dct_hash': self.generate_dct_hash(image_path),
-                'advanced_features': self.extract_advanced_features(image_path)
+                'phash': self.generate_phash(image_path, img_gray=gray),
+                'dct_hash': self.generate_dct_hash(image_path, img_gray=gray),
+                'advanced_features': self.extract_advanced_features(image_path, img_bgr=bgr, img_gray=gray)
             }
 
             # Add TensorFlow embedding if available
-            if self.tf_available:
-                features['tf_embedding'] = self.generate_tf_embedding(image_path)
+            if self.tf_available and include_tf_embedding:
+                features['tf_embedding'] = self.generate_tf_embedding(image_path, img_bgr=bgr)
             else:
                 features['tf_embedding'] = None
 
@@ -171,52 +526,168 @@ class HashGenerator:
             print(f"Feature generation failed: {e}", file=sys.stderr)
             return {
                 'error': str(e),
-                'timestamp': datetime.now(datetime.timezone.utc).isoformat()
+                'timestamp': timestamp or _utc_timestamp()
+            }
+
+    def generate_all_features_from_array(self, bgr, include_tf_embedding=True, timestamp=None):
+        """
+        Generate all features for a frame that is already decoded in memory
+        (BGR ndarray as returned by cv2.VideoCapture.read), skipping the
+        JPEG encode/decode round-trip through disk.
+        Pass include_tf_embedding=False when the caller batches embeddings
+        itself through prepare_tf_input/embed_batch
+        """
+        try:
+            gray = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
+
+            try:
+                small = cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA)
+                phash = self.phash_from_array(small)
+            except Exception as e:
+                print(f"pHash generation failed: {e}", file=sys.stderr)
+                phash = None
+
+            # No DCT hash for frames: the 64-bit frame pHash already thresholds
+            # the same 8x8 DCT block, so a DCT hash would repeat its bits and
+            # count the pHash signal twice in the similarity average
+            dct_hash = None
+
+            try:
+                advanced_features = self._advanced_features_from_bgr(bgr, gray)
+            except Exception as e:
+                print(f"Advanced feature extraction failed: {e}", file=sys.stderr)
+                advanced_features = {}
+
+            features = {
+                'timestamp': timestamp or _utc_timestamp(),
+                'image_path': None,
+                'phash': phash,
+                'dct_hash': dct_hash,
+                'advanced_features': advanced_features
+            }
+
+            # Add TensorFlow embedding if available
+            features['tf_embedding'] = None
+            if self.tf_available and include_tf_embedding:
+                try:
+                    features['tf_embedding'] = self._tf_embedding_from_input(self.prepare_tf_input(bgr))
+                except Exception as e:
+                    print(f"TensorFlow embedding failed: {e}", file=sys.stderr)
+
+            return features
+
+        except Exception as e:
+            print(f"Feature generation failed: {e}", file=sys.stderr)
+            return {
+                'error': str(e),
+                'timestamp': timestamp or _utc_timestamp()
             }
 
+    def generate_all_features_batch(self, items, batch_size=16):
+        """
+        generate_all_features for a list of image paths or of decoded BGR
+        frames. The OpenCV work runs on a thread pool (OpenCV releases the
+        GIL) while the TensorFlow embeddings of all items are computed here
+        in batched forward passes instead of one model call per item
+        """
+        items = list(items)
+        if not items:
+            return []
+
+        # One timestamp for the whole batch
+        timestamp = _utc_timestamp()
+        embeddings = None
+        with ThreadPoolExecutor(max_workers=min(len(items), os.cpu_count() or 1)) as executor:
+            futures = [executor.submit(self.generate_all_features, item, False, timestamp) for item in items]
+
+            if self.tf_available:
+                try:
+                    if all(isinstance(item, np.ndarray) for item in items):
+                        embeddings = self.embed_frames(items, batch_size=batch_size)
+                    else:
+                        embeddings = self.generate_tf_embeddings(items, batch_size=batch_size)
+                except Exception as e:
+                    print(f"Batched TensorFlow embedding failed: {e}", file=sys.stderr)
+
+            results = [future.result() for future in futures]
+
+        if embeddings is not None:
+            for features, embedding in zip(results, embeddings):
+                if embedding is not None and not features.get('error'):
+                    features['tf_embedding'] = embedding
+
+        return results
+
     def generate_certificate_data(self, image_path, additional_metadata=None):
         """
         Generate certificate-ready data with enhanced metadata
         Specifically designed for Copyright Shield certificates
+        Given a list of paths, returns one certificate per path and runs the
+        TensorFlow embeddings as a single batched pass
         """
+        if isinstance(image_path, (list, tuple)):
+            return self._generate_certificate_data_batch(image_path, additional_metadata)
+
         try:
             # Generate all features
             features = self.generate_all_features(image_path)
+            return self._certificate_from_features(features, additional_metadata)
 
-            # Certificate-specific formatting
-            certificate_data = {
-                'generation_timestamp': datetime.utcnow().isoformat(),
-                'content_fingerprint': {
-                    'perceptual_hash': features.get('phash'),
-                    'dct_hash': features.get('dct_hash'),
-                    'has_tensorflow_embedding': features.get('tf_embedding') is not None
-                },
-                'visual_analysis': features.get('advanced_features', {}),
-                'technical_metadata': {
-                    'algorithm_version': 'copyright-shield-v1',
-                    'tensorflow_available': self.tf_available,
-                    'processing_engine': 'HashGenerator'
-                }
-            }
-
-            # Add any additional metadata
-            if additional_metadata:
-                certificate_data['additional_metadata'] = additional_metadata
+        except Exception as e:
+            print(f"Certificate data generation failed: {e}", file=sys.stderr)
+            return {'error': str(e)}
 
-            return certificate_data
+    def _generate_certificate_data_batch(self, image_paths, additional_metadata=None):
+        """Certificate data for several image files (see generate_certificate_data)"""
+        try:
+            all_features = self.generate_all_features_batch(image_paths)
+            timestamp = _utc_timestamp()
+            return [self._certificate_from_features(features, additional_metadata, timestamp)
+                    for features in all_features]
 
         except Exception as e:
             print(f"Certificate data generation failed: {e}", file=sys.stderr)
-            return {'error': str(e)}
+            return [{'error': str(e)} for _ in image_paths]
+
+    def _certificate_from_features(self, features, additional_metadata=None, timestamp=None):
+        """Certificate-specific formatting of a generate_all_features dict"""
+        certificate_data = {
+            'generation_timestamp': timestamp or _utc_timestamp(),
+            'content_fingerprint': {
+                'perceptual_hash': features.get('phash'),
+                'dct_hash': features.get('dct_hash'),
+                'has_tensorflow_embedding': features.get('tf_embedding') is not None
+            },
+            'visual_analysis': features.get('advanced_features', {}),
+            'technical_metadata': {
+                'algorithm_version': 'copyright-shield-v1',
+                'tensorflow_available': self.tf_available,
+                # Embeddings from different backends are not bit-identical
+                'embedding_backend': self.embedding_backend,
+                'processing_engine': 'HashGenerator'
+            }
+        }
+
+        # Add any additional metadata
+        if additional_metadata:
+            certificate_data['additional_metadata'] = additional_metadata
+
+        return certificate_data
+
+# Pretty-printed CLI output; NumPy arrays (embeddings) serialize natively
+_JSON_OPTIONS = orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_APPEND_NEWLINE
 
 if __name__ == "__main__":
     # Test functionality
     generator = HashGenerator()
 
-    if len(sys.argv) > 1:
+    if len(sys.argv) > 2:
+        result = generator.generate_certificate_data(sys.argv[1:])
+        sys.stdout.buffer.write(orjson.dumps(result, option=_JSON_OPTIONS))
+    elif len(sys.argv) > 1:
         image_path = sys.argv[1]
         result = generator.generate_certificate_data(image_path)
-        print(json.dumps(result, indent=2))
+        sys.stdout.buffer.write(orjson.dumps(result, option=_JSON_OPTIONS))
     else:
         print("HashGenerator ready for Copyright Shield")
         print(f"TensorFlow available: {generator.tf_available}")
\ No newline at end of file
@@ -25,9 +25,16 @@ interface AIServiceResponse {
         frame_index: number;
         timestamp: number;
         phash: string;
-        dct_hash: string;
+        // null: video frames carry no separate DCT hash (the pHash covers it)
+        dct_hash: string | null;
         advanced_features: Record<string, any>;
         tf_embedding?: number[];
+        // int8 values (base64) with a per-vector scale: value = q * scale
+        tf_embedding_int8?: {
+          q: string;
+          scale: number;
+          dims: number;
+        };
       }>;
     };
     technical_metadata: {